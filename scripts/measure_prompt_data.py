@@ -0,0 +1,49 @@
+import asyncio
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Compare the prompt size of an employee's data as full rows against the compact
+# blocks the LLM prompts now use. Run from the repo root:
+#   PYTHONPATH=src poetry run python scripts/measure_prompt_data.py <emp_id>
+from services.prompt_data import (
+    token_savings,
+    window_start,
+    VIBE_HISTORY_LIMIT,
+    AWARDS_WINDOW_DAYS,
+    LEAVES_WINDOW_DAYS,
+    PERFORMANCE_REVIEWS_LIMIT,
+)
+from services.supabase import supabase, close_supabase
+
+async def fetch_sources(emp_id):
+    """Every column of the rows the intervention analysis looks at"""
+    queries = {
+        "vibemeter": supabase.table("vibemeter").select("*").eq("emp_id", emp_id)
+            .order("created_at", desc=True).limit(VIBE_HISTORY_LIMIT),
+        "awards": supabase.table("awards").select("*").eq("emp_id", emp_id)
+            .gte("award_date", window_start(AWARDS_WINDOW_DAYS)).order("award_date", desc=True),
+        "leaves": supabase.table("leaves").select("*").eq("emp_id", emp_id)
+            .gte("leave_end_date", window_start(LEAVES_WINDOW_DAYS)).order("leave_start_date", desc=True),
+        "performance_reviews": supabase.table("performance_reviews").select("*").eq("emp_id", emp_id)
+            .order("review_period", desc=True).limit(PERFORMANCE_REVIEWS_LIMIT),
+    }
+    responses = await asyncio.gather(*(query.execute() for query in queries.values()))
+    return {source: response.data or [] for source, response in zip(queries, responses)}
+
+async def main():
+    if len(sys.argv) != 2:
+        print("Usage: measure_prompt_data.py <emp_id>")
+        return
+    try:
+        savings = token_savings(await fetch_sources(sys.argv[1]))
+        for source, (full, compact) in savings.items():
+            print(f"{source}: ~{full} tokens as full rows, ~{compact} tokens compact")
+        full, compact = map(sum, zip(*savings.values()))
+        print(f"total: ~{full} tokens as full rows, ~{compact} tokens compact")
+    finally:
+        await close_supabase()
+
+if __name__ == "__main__":
+    asyncio.run(main())
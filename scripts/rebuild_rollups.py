@@ -0,0 +1,25 @@
+from supabase import create_client, Client
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def main():
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
+    
+    if not supabase_url or not supabase_key:
+        print("Error: SUPABASE_URL or SUPABASE_KEY not found in environment variables")
+        return
+    
+    supabase: Client = create_client(supabase_url, supabase_key)
+    
+    # Recompute every HR analytics rollup from sessions, vibemeter and leaves
+    try:
+        supabase.rpc("rebuild_analytics_rollups", {}).execute()
+        print("Analytics rollups rebuilt")
+    except Exception as e:
+        print(f"Error rebuilding analytics rollups: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import asyncio
+import json
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Run from the repo root with the app's modules importable:
+#   PYTHONPATH=src poetry run python scripts/score_workforce.py
+from services.batch_scoring import new_run, run_batch_scoring
+from services.llm import LLMService
+from services.supabase import close_supabase
+
+async def main():
+    try:
+        run = await run_batch_scoring(LLMService(), new_run())
+        print(json.dumps(run, indent=2))
+    finally:
+        await close_supabase()
+
+if __name__ == "__main__":
+    asyncio.run(main())
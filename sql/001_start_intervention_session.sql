@@ -0,0 +1,39 @@
+-- Creates an intervention session, its opening AI question and its probable
+-- reasons in a single transaction. Called from POST /vibemeter/submit.
+create or replace function start_intervention_session(
+    p_session jsonb,
+    p_first_message jsonb,
+    p_interventions jsonb
+)
+returns uuid
+language plpgsql
+as $$
+declare
+    v_session_id uuid;
+begin
+    insert into sessions (id, emp_id, started_at, title, status, initial_conversation)
+    values (
+        (p_session->>'id')::uuid,
+        p_session->>'emp_id',
+        (p_session->>'started_at')::timestamptz,
+        p_session->>'title',
+        p_session->>'status',
+        p_session->>'initial_conversation'
+    )
+    returning id into v_session_id;
+
+    insert into conversations (session_id, emp_id, conversation, sent_by, created_at)
+    values (
+        v_session_id,
+        p_first_message->>'emp_id',
+        p_first_message->>'conversation',
+        p_first_message->>'sent_by',
+        (p_first_message->>'created_at')::timestamptz
+    );
+
+    insert into probable_reasons (session_id, emp_id, interventions)
+    values (v_session_id, p_session->>'emp_id', p_interventions);
+
+    return v_session_id;
+end;
+$$;
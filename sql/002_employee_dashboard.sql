@@ -0,0 +1,65 @@
+-- Everything GET /hr/employee/{emp_id} needs, gathered in one call.
+-- Session and escalation counts are computed here instead of shipping id rows.
+-- Returns null when the employee does not exist.
+create or replace function employee_dashboard(p_emp_id text)
+returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'emp_id', u.id,
+        'emp_name', u.name,
+        'sessions_this_month', (
+            select count(*) from sessions s
+            where s.emp_id = u.id
+              and s.started_at >= date_trunc('month', now())
+        ),
+        'escalations_this_year', (
+            select count(*) from sessions s
+            where s.emp_id = u.id
+              and s.status = 'escalated'
+              and s.started_at >= date_trunc('year', now())
+        ),
+        'last_session', (
+            select to_jsonb(s) from (
+                select started_at, is_escalated, vulnerability_score
+                from sessions
+                where emp_id = u.id
+                order by started_at desc
+                limit 1
+            ) s
+        ),
+        'current_mood', (
+            select v.mood from vibemeter v
+            where v.emp_id = u.id
+            order by v.created_at desc
+            limit 1
+        ),
+        'latest_leave', (
+            select to_jsonb(l) from leaves l
+            where l.emp_id = u.id
+            order by l.leave_start_date desc
+            limit 1
+        ),
+        'latest_reward', (
+            select to_jsonb(a) from awards a
+            where a.emp_id = u.id
+            order by a.award_date desc
+            limit 1
+        ),
+        'latest_performance', (
+            select to_jsonb(p) from performance_reviews p
+            where p.emp_id = u.id
+            order by p.review_period desc
+            limit 1
+        ),
+        'latest_activity', (
+            select to_jsonb(a) from activity a
+            where a.emp_id = u.id
+            order by a.date_msg desc
+            limit 1
+        )
+    )
+    from "user" u
+    where u.id = p_emp_id;
+$$;
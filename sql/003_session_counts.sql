@@ -0,0 +1,20 @@
+-- Session counts grouped into date_trunc buckets ('day' or 'month') for the
+-- HR charts. Returns one row per non-empty bucket instead of every session.
+create or replace function session_counts(
+    p_start timestamptz,
+    p_end timestamptz,
+    p_period text,
+    p_escalated_only boolean default false
+)
+returns table (bucket timestamptz, total bigint)
+language sql
+stable
+as $$
+    select date_trunc(p_period, started_at) as bucket, count(*) as total
+    from sessions
+    where started_at >= p_start
+      and started_at < p_end
+      and (not p_escalated_only or is_escalated)
+    group by 1
+    order by 1;
+$$;
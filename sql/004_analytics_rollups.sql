@@ -0,0 +1,120 @@
+-- Rollup tables backing the HR analytics charts. The API bumps them on every
+-- write (services/rollups.py) so the charts read O(days) rows instead of
+-- scanning sessions / vibemeter / leaves. rebuild_analytics_rollups() backfills
+-- them from the raw tables (see scripts/rebuild_rollups.py).
+
+create table if not exists daily_session_rollup (
+    day date primary key,
+    sessions integer not null default 0,
+    escalations integer not null default 0
+);
+
+create table if not exists daily_mood_rollup (
+    day date not null,
+    mood text not null,
+    entries integer not null default 0,
+    primary key (day, mood)
+);
+
+create table if not exists yearly_leave_rollup (
+    year integer not null,
+    leave_type text not null,
+    leaves integer not null default 0,
+    primary key (year, leave_type)
+);
+
+create table if not exists yearly_leave_employee_rollup (
+    year integer not null,
+    emp_id text not null,
+    leaves integer not null default 0,
+    primary key (year, emp_id)
+);
+
+create or replace function rollup_sessions(p_day date, p_sessions integer, p_escalations integer)
+returns void
+language sql
+as $$
+    insert into daily_session_rollup (day, sessions, escalations)
+    values (p_day, p_sessions, p_escalations)
+    on conflict (day) do update
+    set sessions = daily_session_rollup.sessions + excluded.sessions,
+        escalations = daily_session_rollup.escalations + excluded.escalations;
+$$;
+
+create or replace function rollup_mood(p_day date, p_mood text, p_delta integer)
+returns void
+language sql
+as $$
+    insert into daily_mood_rollup (day, mood, entries)
+    values (p_day, p_mood, p_delta)
+    on conflict (day, mood) do update
+    set entries = daily_mood_rollup.entries + excluded.entries;
+$$;
+
+create or replace function rollup_leave(p_year integer, p_emp_id text, p_leave_type text, p_delta integer)
+returns void
+language sql
+as $$
+    insert into yearly_leave_rollup (year, leave_type, leaves)
+    values (p_year, p_leave_type, p_delta)
+    on conflict (year, leave_type) do update
+    set leaves = yearly_leave_rollup.leaves + excluded.leaves;
+
+    insert into yearly_leave_employee_rollup (year, emp_id, leaves)
+    values (p_year, p_emp_id, p_delta)
+    on conflict (year, emp_id) do update
+    set leaves = yearly_leave_employee_rollup.leaves + excluded.leaves;
+$$;
+
+create or replace function rebuild_analytics_rollups()
+returns void
+language plpgsql
+as $$
+begin
+    delete from daily_session_rollup where true;
+    insert into daily_session_rollup (day, sessions, escalations)
+    select started_at::date, count(*), count(*) filter (where is_escalated)
+    from sessions
+    group by 1;
+
+    delete from daily_mood_rollup where true;
+    insert into daily_mood_rollup (day, mood, entries)
+    select created_at::date, mood, count(*)
+    from vibemeter
+    group by 1, 2;
+
+    delete from yearly_leave_rollup where true;
+    insert into yearly_leave_rollup (year, leave_type, leaves)
+    select extract(year from leave_start_date)::integer, leave_type, count(*)
+    from leaves
+    where extract(year from leave_start_date) = extract(year from leave_end_date)
+    group by 1, 2;
+
+    delete from yearly_leave_employee_rollup where true;
+    insert into yearly_leave_employee_rollup (year, emp_id, leaves)
+    select extract(year from leave_start_date)::integer, emp_id, count(*)
+    from leaves
+    where extract(year from leave_start_date) = extract(year from leave_end_date)
+    group by 1, 2;
+end;
+$$;
+
+-- session_counts (sql/003) now aggregates the daily rollup instead of sessions.
+create or replace function session_counts(
+    p_start timestamptz,
+    p_end timestamptz,
+    p_period text,
+    p_escalated_only boolean default false
+)
+returns table (bucket timestamptz, total bigint)
+language sql
+stable
+as $$
+    select date_trunc(p_period, day::timestamptz) as bucket,
+           sum(case when p_escalated_only then escalations else sessions end)::bigint as total
+    from daily_session_rollup
+    where day >= p_start::date
+      and day < p_end::date
+    group by 1
+    order by 1;
+$$;
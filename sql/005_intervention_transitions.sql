@@ -0,0 +1,40 @@
+-- Versioned intervention state for conversation turns. Each "move on" turn
+-- writes the advanced interventions list (and, on the last reason, closes the
+-- session) in one conditional update; a client that double-submits against a
+-- stale version gets null back instead of overwriting the newer state.
+alter table probable_reasons
+    add column if not exists version integer not null default 0;
+
+create or replace function apply_intervention_transition(
+    p_reason_id probable_reasons.id%type,
+    p_expected_version integer,
+    p_interventions jsonb,
+    p_end_session sessions.id%type default null
+)
+returns integer
+language plpgsql
+as $$
+declare
+    v_version integer;
+begin
+    update probable_reasons
+    set interventions = p_interventions,
+        version = version + 1
+    where id = p_reason_id
+      and version = p_expected_version
+    returning version into v_version;
+
+    if v_version is null then
+        return null;
+    end if;
+
+    if p_end_session is not null then
+        update sessions
+        set status = 'completed',
+            ended_at = now()
+        where id = p_end_session;
+    end if;
+
+    return v_version;
+end;
+$$;
@@ -0,0 +1,6 @@
+-- Running summary of older conversation messages, kept on the session so the
+-- follow-up and analysis prompts can send it in place of the full transcript.
+-- history_summarized counts the leading messages the summary already covers.
+alter table sessions
+    add column if not exists history_summary text,
+    add column if not exists history_summarized integer not null default 0;
@@ -0,0 +1,5 @@
+-- Result of the rule-based triage run on each /vibemeter/submit before the LLM
+-- analysis: the risk score and whether the submission was passed on to it.
+alter table vibemeter
+    add column if not exists triage_score real,
+    add column if not exists triage_escalated boolean;
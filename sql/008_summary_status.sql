@@ -0,0 +1,4 @@
+-- Progress of the background summary job for a session:
+-- queued / running / done / failed (null until a summary is first requested).
+alter table sessions
+    add column if not exists summary_status text;
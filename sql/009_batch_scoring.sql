@@ -0,0 +1,43 @@
+-- Nightly workforce risk scoring (services/batch_scoring.py). Each run scores
+-- every employee with the vibemeter triage; only flagged employees go on to
+-- the LLM intervention analysis. HR reads the latest run through
+-- latest_employee_risk_scores.
+
+create table if not exists scoring_runs (
+    id uuid primary key,
+    started_at timestamptz not null default now(),
+    finished_at timestamptz,
+    status text not null default 'running',
+    employees integer not null default 0,
+    flagged integer not null default 0,
+    analyzed integer not null default 0,
+    failed integer not null default 0,
+    error text
+);
+
+create table if not exists employee_risk_scores (
+    run_id uuid not null references scoring_runs(id) on delete cascade,
+    emp_id text not null,
+    triage_score real not null,
+    signals jsonb not null,
+    flagged boolean not null,
+    intervention_needed boolean,
+    confidence_score real,
+    interventions jsonb,
+    error text,
+    scored_at timestamptz not null default now(),
+    primary key (run_id, emp_id)
+);
+
+create index if not exists employee_risk_scores_flagged_idx
+    on employee_risk_scores (run_id, flagged, triage_score desc);
+
+create or replace view latest_employee_risk_scores as
+select s.*
+from employee_risk_scores s
+where s.run_id = (
+    select id from scoring_runs
+    where status = 'completed'
+    order by started_at desc
+    limit 1
+);
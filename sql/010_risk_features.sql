@@ -0,0 +1,5 @@
+-- Per-employee trend features (services/risk_features.py) stored with each
+-- batch scoring result: vibe and activity slopes, rolling means, z-scores
+-- against the employee's own baseline, leave days and days since last award.
+alter table employee_risk_scores
+    add column if not exists features jsonb;
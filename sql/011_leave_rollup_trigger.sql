@@ -0,0 +1,32 @@
+-- Keep the leave rollups (sql/004) in step with the table they are rebuilt
+-- from. rebuild_analytics_rollups() and every analytics read use leaves, so
+-- the incremental bumps come from a trigger on leaves itself, whoever writes
+-- it, and skip leaves that cross a year boundary exactly as the rebuild does.
+
+create or replace function leaves_rollup_trigger()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE')
+        and extract(year from old.leave_start_date) = extract(year from old.leave_end_date) then
+        perform rollup_leave(
+            extract(year from old.leave_start_date)::integer, old.emp_id::text, old.leave_type, -1
+        );
+    end if;
+
+    if tg_op in ('INSERT', 'UPDATE')
+        and extract(year from new.leave_start_date) = extract(year from new.leave_end_date) then
+        perform rollup_leave(
+            extract(year from new.leave_start_date)::integer, new.emp_id::text, new.leave_type, 1
+        );
+    end if;
+
+    return null;
+end;
+$$;
+
+drop trigger if exists leaves_rollup on leaves;
+create trigger leaves_rollup
+    after insert or update or delete on leaves
+    for each row execute function leaves_rollup_trigger();
@@ -0,0 +1,86 @@
+-- Claims on background summary jobs (services/summaries.py), so that with
+-- several server processes each session is summarized by one of them at a
+-- time. A worker claims a session by moving it to 'running' and stamping
+-- summary_claimed_at; the claim is a lease the worker renews while it keeps
+-- retrying. Sessions that stay 'queued', or 'running' past the lease, are
+-- picked up again by the next process to start.
+alter table sessions
+    add column if not exists summary_claimed_at timestamptz;
+
+-- Mark a session's summary as queued, unless another worker holds a live claim on it
+create or replace function queue_session_summary(
+    p_session sessions.id%type,
+    p_lease_seconds integer
+)
+returns boolean
+language plpgsql
+as $$
+declare
+    v_id sessions.id%type;
+begin
+    update sessions
+    set summary_status = 'queued',
+        summary_claimed_at = null
+    where id = p_session
+      and (summary_status is distinct from 'running'
+           or summary_claimed_at is null
+           or summary_claimed_at < now() - make_interval(secs => p_lease_seconds))
+    returning id into v_id;
+
+    return v_id is not null;
+end;
+$$;
+
+-- Claim one queued (or abandoned) summary job; false if another worker has it
+create or replace function claim_session_summary(
+    p_session sessions.id%type,
+    p_lease_seconds integer
+)
+returns boolean
+language plpgsql
+as $$
+declare
+    v_id sessions.id%type;
+begin
+    update sessions
+    set summary_status = 'running',
+        summary_claimed_at = now()
+    where id = p_session
+      and (summary_status = 'queued'
+           or (summary_status = 'running'
+               and (summary_claimed_at is null
+                    or summary_claimed_at < now() - make_interval(secs => p_lease_seconds))))
+    returning id into v_id;
+
+    return v_id is not null;
+end;
+$$;
+
+-- Claim up to p_limit summary jobs left queued or abandoned by a stopped process.
+-- Sessions that never had a summary requested (summary_status null) are not touched.
+create or replace function claim_pending_summaries(
+    p_lease_seconds integer,
+    p_limit integer
+)
+returns table (id sessions.id%type, emp_id sessions.emp_id%type)
+language plpgsql
+as $$
+begin
+    return query
+    update sessions s
+    set summary_status = 'running',
+        summary_claimed_at = now()
+    where s.id in (
+        select p.id
+        from sessions p
+        where p.summary_status = 'queued'
+           or (p.summary_status = 'running'
+               and (p.summary_claimed_at is null
+                    or p.summary_claimed_at < now() - make_interval(secs => p_lease_seconds)))
+        order by p.ended_at nulls last
+        limit p_limit
+        for update skip locked
+    )
+    returning s.id, s.emp_id;
+end;
+$$;
@@ -0,0 +1,17 @@
+-- Keys the batch scoring reads page by (services/batch_scoring.py _fetch_all):
+-- each page starts after the last (date, emp_id) of the previous one, which
+-- these indexes answer without sorting the whole table per page.
+create index if not exists vibemeter_created_at_emp_id_idx
+    on vibemeter (created_at, emp_id);
+
+create index if not exists awards_award_date_emp_id_idx
+    on awards (award_date, emp_id);
+
+create index if not exists leaves_leave_start_date_emp_id_idx
+    on leaves (leave_start_date, emp_id);
+
+create index if not exists performance_reviews_review_period_emp_id_idx
+    on performance_reviews (review_period, emp_id);
+
+create index if not exists activity_date_msg_emp_id_idx
+    on activity (date_msg, emp_id);
@@ -0,0 +1,67 @@
+-- Idempotent POST /vibemeter/submit. A client that retries a submission sends
+-- the same Idempotency-Key header; the key is stored with the vibe and with
+-- the intervention session it started, so a retry neither stores the vibe
+-- again nor starts a second session.
+alter table vibemeter
+    add column if not exists idempotency_key text;
+
+create unique index if not exists vibemeter_emp_id_idempotency_key_idx
+    on vibemeter (emp_id, idempotency_key)
+    where idempotency_key is not null;
+
+alter table sessions
+    add column if not exists idempotency_key text;
+
+create unique index if not exists sessions_emp_id_idempotency_key_idx
+    on sessions (emp_id, idempotency_key)
+    where idempotency_key is not null;
+
+-- As in sql/001, but a session whose key is already taken is returned instead
+-- of being created again.
+create or replace function start_intervention_session(
+    p_session jsonb,
+    p_first_message jsonb,
+    p_interventions jsonb
+)
+returns uuid
+language plpgsql
+as $$
+declare
+    v_session_id uuid;
+begin
+    insert into sessions (id, emp_id, started_at, title, status, initial_conversation, idempotency_key)
+    values (
+        (p_session->>'id')::uuid,
+        p_session->>'emp_id',
+        (p_session->>'started_at')::timestamptz,
+        p_session->>'title',
+        p_session->>'status',
+        p_session->>'initial_conversation',
+        p_session->>'idempotency_key'
+    )
+    on conflict (emp_id, idempotency_key) where idempotency_key is not null do nothing
+    returning id into v_session_id;
+
+    if v_session_id is null then
+        select id into v_session_id
+        from sessions
+        where emp_id = p_session->>'emp_id'
+          and idempotency_key = p_session->>'idempotency_key';
+        return v_session_id;
+    end if;
+
+    insert into conversations (session_id, emp_id, conversation, sent_by, created_at)
+    values (
+        v_session_id,
+        p_first_message->>'emp_id',
+        p_first_message->>'conversation',
+        p_first_message->>'sent_by',
+        (p_first_message->>'created_at')::timestamptz
+    );
+
+    insert into probable_reasons (session_id, emp_id, interventions)
+    values (v_session_id, p_session->>'emp_id', p_interventions);
+
+    return v_session_id;
+end;
+$$;
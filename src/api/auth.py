@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Response, Cookie
 from services.supabase import supabase
 from models.schemas import User, LoginRequest
-from passlib.context import CryptContext
+from services.passwords import verify_and_update, password_pool_stats
+from api.common import verify_hr_role
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 import os
@@ -14,22 +15,20 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    """Verify on the bcrypt worker pool; returns (valid, new_hash)"""
+    return await verify_and_update(plain_password, hashed_password)
 
 @router.post("/login")
 async def login(response: Response, login_data: LoginRequest):
     # Get user from database
-    result = supabase.table("user").select("*").eq("id", login_data.employee_id).execute()
+    result = await supabase.table("user").select("*").eq("id", login_data.employee_id).execute()
     
     if not result.data:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
@@ -41,9 +40,14 @@ async def login(response: Response, login_data: LoginRequest):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     
     # Verify password
-    if not verify_password(login_data.password, user["password"]):
+    valid, new_hash = await verify_password(login_data.password, user["password"])
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     
+    # Stored hash uses an outdated bcrypt cost, replace it
+    if new_hash:
+        await supabase.table("user").update({"password": new_hash}).eq("id", user["id"]).execute()
+    
     # Create JWT token
     token = create_access_token({"sub": user["id"], "role": user["role"]})
     
@@ -69,4 +73,8 @@ async def login(response: Response, login_data: LoginRequest):
 @router.post("/logout")
 async def logout(response: Response):
     response.delete_cookie("auth_token")
-    return {"message": "Logged out successfully"}
\ No newline at end of file
+    return {"message": "Logged out successfully"}
+
+@router.get("/password-pool")
+async def get_password_pool_stats(payload: dict = Depends(verify_hr_role)):
+    return password_pool_stats()
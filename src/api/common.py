@@ -1,31 +1,69 @@
-from fastapi import  HTTPException, status, Cookie
+from fastapi import  HTTPException, status, Cookie, Depends, Request
 from jose import JWTError, jwt
+from services.cache import TTLCache
+from services.llm import LLMService
+from services.summaries import SummaryQueue
+from typing import Optional
 import os
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
 
-async def get_employee_id(auth_token: str = Cookie(None)):
+# Recently verified tokens -> decoded claims, each kept no longer than the token's own expiry
+_verified_tokens = TTLCache("verified_tokens", maxsize=AUTH_CACHE_SIZE)
+
+def decode_auth_token(auth_token: Optional[str]) -> dict:
+    """Verify a JWT and return its `sub` and `role` claims, reusing recent verifications"""
     if not auth_token:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, 
+            status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authenticated"
         )
-    
+
+    claims = _verified_tokens.get(auth_token)
+    if claims is not None:
+        return claims
+
     try:
         payload = jwt.decode(auth_token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(payload)
-        employee_id = payload.get("sub")
-        
-        if employee_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        
-        return employee_id
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
-        )
\ No newline at end of file
+        )
+
+    if payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+
+    claims = {"sub": payload["sub"], "role": payload.get("role")}
+    remaining = payload.get("exp", 0) - time.time()
+    if remaining > 0:
+        _verified_tokens.set(auth_token, claims, ttl=remaining)
+    return claims
+
+async def get_current_user(auth_token: str = Cookie(None)) -> dict:
+    """Decode the auth cookie once per request and return its `sub` and `role` claims"""
+    return decode_auth_token(auth_token)
+
+async def get_employee_id(user: dict = Depends(get_current_user)) -> str:
+    return user["sub"]
+
+async def verify_hr_role(user: dict = Depends(get_current_user)) -> dict:
+    if user["role"] != "hr":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized. HR role required."
+        )
+    return user
+
+def get_llm_service(request: Request) -> LLMService:
+    """The shared LLMService created in the app lifespan (override it in tests)"""
+    return request.app.state.llm_service
+
+def get_summary_queue(request: Request) -> SummaryQueue:
+    return request.app.state.summary_queue
@@ -1,14 +1,34 @@
-from fastapi import APIRouter, HTTPException, status,Request, Depends
-from api.common import get_employee_id
+from fastapi import APIRouter, HTTPException, status,Request, Depends, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from api.common import get_employee_id, get_llm_service, get_summary_queue, decode_auth_token
 from services.supabase import supabase
+from services.cache import session_state_cache
+from services.history import compact_history, pending_fold
 from datetime import datetime
 from services.llm import LLMService
-from typing import Dict, Any, Optional
+from services.summaries import SummaryQueue
+from typing import AsyncIterator, Dict, Any, List, Optional, Set, Tuple
+import asyncio
+import copy
+import json
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
-llm_service = LLMService()
+
+# Writes that must finish even when the request awaiting them is cancelled
+_detached_writes: Set[asyncio.Task] = set()
+
+def _run_detached(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _detached_writes.add(task)
+    task.add_done_callback(_detached_writes.discard)
+    return task
+
+def _log_detached_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Storing an interrupted streamed turn failed: {str(task.exception())}")
 
 async def _insert_conversation(
     session_id: str,
@@ -18,7 +38,7 @@ async def _insert_conversation(
     timestamp: str
 ) -> Optional[Dict[str, Any]]:
     """Helper function to insert conversation records"""
-    response = supabase.table("conversations").insert({
+    response = await supabase.table("conversations").insert({
         "session_id": session_id,
         "emp_id": emp_id,
         "created_at": timestamp,
@@ -30,8 +50,8 @@ async def _insert_conversation(
 
 async def _get_probable_reasons(emp_id: str, session_id: str) -> Dict[str, Any]:
     """Fetch probable reasons for a session"""
-    reasons_data = supabase.table("probable_reasons") \
-        .select("id, interventions") \
+    reasons_data = await supabase.table("probable_reasons") \
+        .select("id, interventions, version") \
         .eq("emp_id", emp_id) \
         .eq("session_id", session_id) \
         .single() \
@@ -45,35 +65,290 @@ async def _get_probable_reasons(emp_id: str, session_id: str) -> Dict[str, Any]:
     return reasons_data.data
 
 
-async def _update_reasons(reason_id: str, interventions: list) -> None:
-    """Update reasons in database"""
-    update_result = supabase.table("probable_reasons").update({
-        "interventions": interventions  # Changed from 'reasons' to 'interventions'
-    }).eq("id", reason_id).execute()
-    
-    if not update_result.data:
-        raise HTTPException(
-            status_code=500,
-            detail="Failed to update probable reasons"
-        )
+async def _apply_transition(probable_reason: Dict[str, Any], end_session: Optional[str] = None) -> int:
+    """Store advanced interventions, and close `end_session` if given, in one conditional update.
 
-async def _update_session_status(session_id: str, status: str) -> None:
-    """Helper function to update the status of a session in the database."""
-    response = supabase.table("sessions").update({
-        "status": status,
-        "ended_at": datetime.utcnow().isoformat()
-    }).eq("id", session_id).execute()
+    The write only applies if the row is still at the version the turn was computed
+    from; returns the new version, or raises 409 when another request got there first.
+    """
+    response = await supabase.rpc("apply_intervention_transition", {
+        "p_reason_id": probable_reason["id"],
+        "p_expected_version": probable_reason.get("version", 0),
+        "p_interventions": probable_reason["interventions"],
+        "p_end_session": end_session
+    }).execute()
 
-    if not response.data:
+    if response.data is None:
         raise HTTPException(
-            status_code=500,
-            detail=f"Failed to update session status to {status}."
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This conversation was updated by another request. Please retry."
         )
+    return response.data
+
+
+
+CLOSING_MESSAGE = "Thank you for sharing. I appreciate your openness."
+
+async def _load_turn(emp_id: str, session_id: str) -> Dict[str, Any]:
+    """Load the conversation history and intervention cursor a follow-up turn needs"""
+    conv_history, probable_reason, session = await asyncio.gather(
+        supabase.table("conversations") \
+            .select("conversation, sent_by, created_at") \
+            .eq("emp_id", emp_id) \
+            .eq("session_id", session_id) \
+            .order("created_at") \
+            .execute(),
+        _get_probable_reasons(emp_id, session_id),
+        supabase.table("sessions") \
+            .select("history_summary, history_summarized") \
+            .eq("id", session_id) \
+            .execute()
+    )
+    stored = session.data[0] if session.data else {}
+
+    turn = {
+        "history": [f"{msg['sent_by']}: {msg['conversation']}" for msg in conv_history.data or []],
+        "probable_reason": probable_reason,
+        # Shared (not copied) by _fork_turn, so a background fold updates every copy
+        "compaction": {
+            "summary": stored.get("history_summary"),
+            "summarized": stored.get("history_summarized") or 0,
+            "task": None,
+        },
+    }
+    _refresh_cursor(turn)
+    return turn
+
+async def _get_turn(emp_id: str, session_id: str) -> Dict[str, Any]:
+    """The cached turn state for a session, loaded from the database (and cached) on a miss"""
+    turn = session_state_cache.get((emp_id, session_id))
+    if turn is None:
+        turn = await _load_turn(emp_id, session_id)
+        session_state_cache.set((emp_id, session_id), turn)
+    return turn
+
+def _keep_turn(emp_id: str, session_id: str, base: Dict[str, Any], turn: Dict[str, Any], end_chat: bool) -> None:
+    """Replace the cached `base` state with `turn` (restarting its idle timeout), or drop it once the chat is over.
+
+    If another turn of the same session replaced `base` in the meantime, neither
+    copy holds both turns' history: the entry is dropped and the next turn reloads it.
+    """
+    if end_chat:
+        session_state_cache.invalidate((emp_id, session_id))
+    elif not session_state_cache.replace((emp_id, session_id), base, turn):
+        logger.info(f"Concurrent turns on session {session_id}; turn state will be reloaded")
+
+def _fork_turn(turn: Dict[str, Any]) -> Dict[str, Any]:
+    """A copy of the turn state that can be advanced without touching the cached one"""
+    draft = {
+        "history": list(turn["history"]),
+        "probable_reason": copy.deepcopy(turn["probable_reason"]),
+        "compaction": turn["compaction"],
+    }
+    _refresh_cursor(draft)
+    return draft
+
+def _refresh_cursor(turn: Dict[str, Any]) -> None:
+    """Find current active and next reasons"""
+    interventions = turn["probable_reason"].get("interventions", [])
+    turn["current_active_reason"] = next((r for r in interventions if r.get("active")), None)
+    turn["next_reason"] = next((r for r in interventions if not r.get("asked")), None)
+
+def _history_text(turn: Dict[str, Any]) -> str:
+    compaction = turn["compaction"]
+    return compact_history(turn["history"], compaction["summary"], compaction["summarized"], "followup") \
+        or "No conversation history yet"
+
+def _schedule_compaction(session_id: str, turn: Dict[str, Any], llm_service: LLMService) -> None:
+    """Fold messages that left the verbatim window into the running summary, off the reply path"""
+    compaction = turn["compaction"]
+    if compaction["task"] is not None:
+        return
+    messages = pending_fold(turn["history"], compaction["summarized"])
+    if messages:
+        compaction["task"] = asyncio.create_task(_compact_history(session_id, compaction, messages, llm_service))
+
+async def _compact_history(session_id: str, compaction: Dict[str, Any], messages: list, llm_service: LLMService) -> None:
+    try:
+        summary = await llm_service.summarize_history(compaction["summary"], messages)
+        summarized = compaction["summarized"] + len(messages)
+        await supabase.table("sessions").update({
+            "history_summary": summary,
+            "history_summarized": summarized
+        }).eq("id", session_id).execute()
+        compaction["summary"] = summary
+        compaction["summarized"] = summarized
+    except Exception as e:
+        # The messages stay verbatim (within budget) until the next fold succeeds
+        logger.error(f"History compaction failed for session {session_id}: {str(e)}", exc_info=True)
+    finally:
+        compaction["task"] = None
+
+def _record_exchange(turn: Dict[str, Any], text: Optional[str], ai_response: str) -> None:
+    if text:
+        turn["history"].append(f"user: {text}")
+    turn["history"].append(f"ai: {ai_response}")
+
+def _advance_interventions(turn: Dict[str, Any], followup_result: Dict[str, Any]) -> bool:
+    """Apply a follow-up decision to the in-memory interventions.
+
+    Marks the current reason asked, activates the next one and fills in the reply
+    for a "move on" decision. Returns True when the chat is over.
+    """
+    if followup_result["continue_followup"]:
+        return False
+
+    current_active_reason = turn["current_active_reason"]
+    next_reason = turn["next_reason"]
+    followup_result["response"] = _transition_response(turn)
+
+    if current_active_reason:
+        current_active_reason["asked"] = True
+        current_active_reason["active"] = False
+
+    end_chat = False
+    if next_reason:
+        next_reason["active"] = True
+        followup_result["reason"] = "Moving to next reason"
+    else:
+        followup_result["reason"] = "All interventions completed"
+        end_chat = True
+        _mark_all_asked(turn)
+
+    _refresh_cursor(turn)
+    return end_chat
+
+def _mark_all_asked(turn: Dict[str, Any]) -> None:
+    for intervention in turn["probable_reason"].get("interventions", []):
+        intervention["asked"] = True
+        intervention["active"] = False
+    _refresh_cursor(turn)
+
+def _is_exhausted(turn: Dict[str, Any]) -> bool:
+    return not turn["next_reason"] and not turn["current_active_reason"]
+
+def _transition_response(turn: Dict[str, Any]) -> str:
+    """The AI message used when the LLM decides to stop following up on the current reason"""
+    if turn["next_reason"]:
+        return turn["next_reason"].get("question", "Could you tell me more about this?")
+    return CLOSING_MESSAGE
+
+async def _finish_exhausted_turn(session_id: str, emp_id: str, turn: Dict[str, Any], text: Optional[str], current_time: str) -> Dict[str, Any]:
+    """End the session when every intervention has already been covered"""
+    session_state_cache.invalidate((emp_id, session_id))
+    turn = _fork_turn(turn)
+    _mark_all_asked(turn)
+    await _apply_transition(turn["probable_reason"], end_session=session_id)
+    user_message = await _insert_conversation(session_id, emp_id, text, "user", current_time) if text else None
+    ai_message = await _insert_conversation(session_id, emp_id, CLOSING_MESSAGE, "ai", current_time)
+    return {
+        "user_message": user_message,
+        "ai_message": ai_message,
+        "status": "completed"
+    }
+
+async def _complete_turn(
+    session_id: str,
+    emp_id: str,
+    turn: Dict[str, Any],
+    text: Optional[str],
+    current_time: str,
+    followup_result: Dict[str, Any],
+    llm_service: LLMService
+) -> Dict[str, Any]:
+    """Apply the follow-up decision to the turn state, write it through and build the reply"""
+    # Advance a copy so a rejected (stale) transition leaves the cached state untouched
+    base = turn
+    turn = _fork_turn(base)
+    current_active_reason = turn["current_active_reason"]
+    next_reason = turn["next_reason"]
+
+    # Debug prints
+    print(f"LLM follow-up decision: {followup_result}")
+    print(f"Current active reason: {current_active_reason}")
+    print(f"Next reason available: {next_reason}")
+
+    end_chat = _advance_interventions(turn, followup_result)
+    ai_response = followup_result["response"]
 
+    try:
+        if not followup_result["continue_followup"]:
+            turn["probable_reason"]["version"] = await _apply_transition(
+                turn["probable_reason"],
+                end_session=session_id if end_chat else None
+            )
+
+        # Insert messages
+        user_message = await _insert_conversation(session_id, emp_id, text, "user", current_time) if text else None
+        ai_message = await _insert_conversation(session_id, emp_id, ai_response, "ai", current_time)
+    except Exception:
+        # The cached state is now ahead of the database; reload it on the next turn
+        session_state_cache.invalidate((emp_id, session_id))
+        raise
+
+    _record_exchange(turn, text, ai_response)
+    _keep_turn(emp_id, session_id, base, turn, end_chat)
+    if not end_chat:
+        _schedule_compaction(session_id, turn, llm_service)
+
+    return {
+        "user_message": {
+            "text": text,
+            "created_at": current_time,
+            "sent_by": "user",
+            "id": user_message.get("id") if user_message else None
+        } if text else None,
+        "ai_message": {
+            "text": ai_response,
+            "created_at": current_time,
+            "sent_by": "ai",
+            "id": ai_message.get("id")
+        },
+        "status": "completed" if end_chat else "ongoing",
+        "current_reason": current_active_reason.get("reason") if current_active_reason else None,
+        "next_reason": next_reason.get("reason") if next_reason else None,
+        "decision_reason": followup_result.get("reason", "")
+    }
+
+async def _stream_reply(turn: Dict[str, Any], text: Optional[str], emp_id: str, llm_service: LLMService) -> AsyncIterator[Tuple[str, Any]]:
+    """Yield ("decision", continue_followup) once known, ("token", text) pieces of the AI
+    reply as they are generated, then ("result", followup_result)"""
+    followup_result = None
+    streamed = False
+    async for event in llm_service.stream_followup_question(
+        employee_name=emp_id,
+        current_response=text,
+        conversation_history=_history_text(turn)
+    ):
+        if event["type"] == "decision":
+            yield "decision", event["continue_followup"]
+            if not event["continue_followup"]:
+                # The reply is the next scripted question, known without waiting for the model
+                yield "token", _transition_response(turn)
+                streamed = True
+        elif event["type"] == "token":
+            yield "token", event["text"]
+            streamed = True
+        elif event["type"] == "result":
+            followup_result = {k: v for k, v in event.items() if k != "type"}
+
+    if not streamed:
+        yield "decision", followup_result["continue_followup"]
+        yield "token", followup_result["response"] if followup_result["continue_followup"] else _transition_response(turn)
+    yield "result", followup_result
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 
 @router.post("/{session_id}")
-async def follow_up(req: Request, session_id: str, emp_id: str = Depends(get_employee_id)) -> Dict[str, Any]:
+async def follow_up(
+    req: Request,
+    session_id: str,
+    emp_id: str = Depends(get_employee_id),
+    llm_service: LLMService = Depends(get_llm_service),
+    summary_queue: SummaryQueue = Depends(get_summary_queue)
+) -> Dict[str, Any]:
     try:
         body = await req.json()
         text = body.get("text")
@@ -82,107 +357,24 @@ async def follow_up(req: Request, session_id: str, emp_id: str = Depends(get_emp
         if not emp_id:
             raise HTTPException(status_code=400, detail="Employee ID (emp_id) is required.")
         
-        # Get conversation history
-        conv_history = supabase.table("conversations") \
-            .select("conversation, sent_by, created_at") \
-            .eq("emp_id", emp_id) \
-            .eq("session_id", session_id) \
-            .order("created_at") \
-            .execute()
-
-        history_text = "\n".join(
-            f"{msg['sent_by']}: {msg['conversation']}" 
-            for msg in conv_history.data
-        ) if conv_history.data else "No conversation history yet"
-
-        # Get interventions
-        probable_reason = await _get_probable_reasons(emp_id, session_id)
-        interventions = probable_reason.get("interventions", [])
-        
-        # Find current active and next reasons
-        current_active_reason = next((r for r in interventions if r.get("active")), None)
-        next_reason = next((r for r in interventions if not r.get("asked")), None)
+        turn = await _get_turn(emp_id, session_id)
 
         # End if no more reasons left
-        if not next_reason and not current_active_reason:
-            user_message = await _insert_conversation(session_id, emp_id, text, "user", current_time) if text else None
-            ai_message = await _insert_conversation(session_id, emp_id, "Thank you for sharing. I appreciate your openness.", "ai", current_time)
-            await _update_session_status(session_id, "completed")
-            await _mark_all_interventions_asked(probable_reason["id"])
-            return {
-                "user_message": user_message,
-                "ai_message": ai_message,
-                "status": "completed"
-            }
-
-        # Get follow-up decision from LLM
-        followup_result = await llm_service.ask_followup_question(
-            employee_name=emp_id,
-            current_response=text, 
-            conversation_history=history_text
-        )
-
-        # Debug prints
-        print(f"LLM follow-up decision: {followup_result}")
-        print(f"Current active reason: {current_active_reason}")
-        print(f"Next reason available: {next_reason}")
-
-        # Determine AI response based on follow-up decision
-        end_chat = False
-        if not followup_result["continue_followup"]:
-            # Mark current reason as complete if exists
-            if current_active_reason:
-                await _update_intervention_status(
-                    probable_reason["id"], 
-                    current_active_reason["reason"], 
-                    asked=True, 
-                    active=False
-                )
-
-            # Move to next reason if available
-            if next_reason:
-                await _update_intervention_status(
-                    probable_reason["id"], 
-                    next_reason["reason"], 
-                    active=True
-                )
-                ai_response = next_reason.get("question", "Could you tell me more about this?")
-                followup_result["response"] = ai_response
-                followup_result["reason"] = "Moving to next reason"
-            else:
-                # No more reasons left - end chat
-                ai_response = "Thank you for sharing. I appreciate your openness."
-                followup_result["response"] = ai_response
-                followup_result["reason"] = "All interventions completed"
-                end_chat = True
-                await _update_session_status(session_id, "completed")
-                await _mark_all_interventions_asked(probable_reason["id"])
+        if _is_exhausted(turn):
+            result = await _finish_exhausted_turn(session_id, emp_id, turn, text, current_time)
         else:
-            # Continue with current reason using LLM's response
-            ai_response = followup_result["response"]
-
-        # Insert messages
-        user_message = await _insert_conversation(session_id, emp_id, text, "user", current_time) if text else None
-        ai_message = await _insert_conversation(session_id, emp_id, ai_response, "ai", current_time)
+            # Get follow-up decision from LLM
+            followup_result = await llm_service.ask_followup_question(
+                employee_name=emp_id,
+                current_response=text, 
+                conversation_history=_history_text(turn)
+            )
+            result = await _complete_turn(session_id, emp_id, turn, text, current_time, followup_result, llm_service)
 
-        return {
-            "user_message": {
-                "text": text,
-                "created_at": current_time,
-                "sent_by": "user",
-                "id": user_message.get("id") if user_message else None
-            } if text else None,
-            "ai_message": {
-                "text": ai_response,
-                "created_at": current_time,
-                "sent_by": "ai",
-                "id": ai_message.get("id")
-            },
-            "status": "completed" if end_chat else "ongoing",
-            "current_reason": current_active_reason.get("reason") if current_active_reason else None,
-            "next_reason": next_reason.get("reason") if next_reason else None,
-            "decision_reason": followup_result.get("reason", "")
-        }
+        # Summarize the finished chat in the background; the reply doesn't wait for it
+        if result["status"] == "completed":
+            await summary_queue.enqueue(emp_id, session_id)
+        return result
 
     except HTTPException:
         raise
@@ -191,68 +383,251 @@ async def follow_up(req: Request, session_id: str, emp_id: str = Depends(get_emp
         raise HTTPException(status_code=500, detail="An unexpected error occurred while processing your request.")
 
 
-async def _update_intervention_status(
-    reason_id: str,
-    intervention_reason: str,
-    asked: Optional[bool] = None,
-    active: Optional[bool] = None
-) -> None:
-    """Update the status of a specific intervention by its reason text"""
-    # Get current probable_reason record
-    probable_reason = supabase.table("probable_reasons") \
-        .select("*") \
-        .eq("id", reason_id) \
-        .single() \
-        .execute() \
-        .data
-    
-    # Update the specific intervention
-    updated_interventions = []
-    for intervention in probable_reason["interventions"]:
-        if intervention["reason"] == intervention_reason:
-            if asked is not None:
-                intervention["asked"] = asked
-            if active is not None:
-                intervention["active"] = active
-        updated_interventions.append(intervention)
-    
-    # Update the entire record
-    supabase.table("probable_reasons") \
-        .update({"interventions": updated_interventions}) \
-        .eq("id", reason_id) \
-        .execute()
-
-async def _mark_all_interventions_asked(reason_id: str) -> None:
-    """Mark all interventions as asked for a given reason"""
-    probable_reason = supabase.table("probable_reasons") \
-        .select("*") \
-        .eq("id", reason_id) \
-        .single() \
-        .execute() \
-        .data
-    
-    updated_interventions = []
-    for intervention in probable_reason["interventions"]:
-        intervention["asked"] = True
-        intervention["active"] = False
-        updated_interventions.append(intervention)
-    
-    supabase.table("probable_reasons") \
-        .update({"interventions": updated_interventions}) \
-        .eq("id", reason_id) \
-        .execute()
-
-
-
-
-
-
-
-
-
+@router.post("/{session_id}/stream")
+async def follow_up_stream(
+    req: Request,
+    session_id: str,
+    emp_id: str = Depends(get_employee_id),
+    llm_service: LLMService = Depends(get_llm_service),
+    summary_queue: SummaryQueue = Depends(get_summary_queue)
+) -> StreamingResponse:
+    """Server-sent-events variant of follow_up.
+
+    Emits `token` events with the AI reply as it is generated, then a single `done`
+    event carrying the same payload follow_up returns, once the intervention state
+    and both messages have been stored. A failure mid-reply ends the stream with an
+    `error` event and stores nothing. If the client goes away mid-reply, the turn is
+    still stored, with the part of the reply it was sent.
+    """
+    body = await req.json()
+    text = body.get("text")
+    current_time = datetime.utcnow().isoformat()
+
+    # Load before streaming starts so lookup failures are still plain HTTP errors
+    turn = await _get_turn(emp_id, session_id)
+
+    async def store(followup_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Store the turn (followup_result is None for a session with nothing left to ask)"""
+        if followup_result is None:
+            result = await _finish_exhausted_turn(session_id, emp_id, turn, text, current_time)
+        else:
+            result = await _complete_turn(session_id, emp_id, turn, text, current_time, followup_result, llm_service)
+        if result["status"] == "completed":
+            await summary_queue.enqueue(emp_id, session_id)
+        return result
+
+    async def events():
+        sent: List[str] = []
+        continue_followup = None
+        followup_result = None
+        storing = None
+        try:
+            if _is_exhausted(turn):
+                yield _sse("token", {"text": CLOSING_MESSAGE})
+                sent.append(CLOSING_MESSAGE)
+            else:
+                async for kind, value in _stream_reply(turn, text, emp_id, llm_service):
+                    if kind == "decision":
+                        continue_followup = value
+                    elif kind == "token":
+                        yield _sse("token", {"text": value})
+                        sent.append(value)
+                    else:
+                        followup_result = value
+
+            # Shielded: a disconnect from here on no longer interrupts the writes
+            storing = _run_detached(store(followup_result))
+            yield _sse("done", await asyncio.shield(storing))
+
+        except Exception as e:
+            logger.error(f"Error in follow_up_stream endpoint: {str(e)}", exc_info=True)
+            yield _sse("error", {"detail": "An unexpected error occurred while processing your request."})
+        except BaseException:
+            # The client went away: keep the turn as far as it was shown
+            if storing is None and sent:
+                if _is_exhausted(turn) or followup_result is not None:
+                    storing = _run_detached(store(followup_result))
+                else:
+                    storing = _run_detached(store({
+                        "continue_followup": continue_followup,
+                        "response": "".join(sent) if continue_followup else "",
+                        "reason": "Reply interrupted"
+                    }))
+            if storing is not None:
+                storing.add_done_callback(_log_detached_failure)
+            raise
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _insert_conversations(rows: list) -> None:
+    """Insert several conversation records in one request"""
+    await supabase.table("conversations").insert(rows).execute()
+
+def _conversation_row(session_id: str, emp_id: str, message: str, sender: str, timestamp: str) -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "emp_id": emp_id,
+        "created_at": timestamp,
+        "sent_by": sender,
+        "conversation": message
+    }
+
+
+class _WriteBehind:
+    """Runs one connection's database writes in submission order, off the reply path.
+
+    Each write assumes the ones before it landed, so after the first failure the
+    rest are dropped, `error` is set and `on_failure` is called; the connection
+    must then resync from the database.
+    """
+
+    def __init__(self, on_failure):
+        self.error: Optional[Exception] = None
+        self._on_failure = on_failure
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, func, *args) -> None:
+        self._queue.put_nowait((func, args))
+
+    async def _run(self) -> None:
+        while True:
+            func, args = await self._queue.get()
+            try:
+                if self.error is not None:
+                    logger.warning(f"Dropping deferred conversation write {func.__name__} after an earlier failure")
+                    continue
+                await func(*args)
+            except Exception as e:
+                logger.error(f"Deferred conversation write {func.__name__} failed: {str(e)}", exc_info=True)
+                self.error = e
+                self._on_failure()
+            finally:
+                self._queue.task_done()
+
+    async def close(self) -> None:
+        """Flush pending writes, then stop the worker"""
+        await self._queue.join()
+        self._task.cancel()
+
+
+@router.websocket("/{session_id}/ws")
+async def conversation_socket(websocket: WebSocket, session_id: str):
+    """Persistent chat channel for one intervention session.
+
+    The client is authenticated and the history/interventions are loaded once per
+    connection. Each turn the client sends {"text": ...}; the server pushes
+    {"type": "token", "text": ...} while the reply is generated and then
+    {"type": "done", ...} with the same payload as follow_up. Messages and state
+    changes are written behind the reply, in order.
+    """
+    try:
+        emp_id = decode_auth_token(websocket.cookies.get("auth_token"))["sub"]
+        turn = await _get_turn(emp_id, session_id)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+    except Exception as e:
+        logger.error(f"Failed to open conversation socket: {str(e)}", exc_info=True)
+        await websocket.close(code=1011)
+        return
 
+    llm_service: LLMService = websocket.app.state.llm_service
+    # A failed write means this connection's state is ahead of the database:
+    # drop the cached copy so the reconnecting client resyncs from the database
+    writer = _WriteBehind(lambda: session_state_cache.invalidate((emp_id, session_id)))
+    completed = False
+    await websocket.accept()
 
+    try:
+        while True:
+            body = await websocket.receive_json()
+            if writer.error is not None:
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": "This conversation could not be saved. Please reconnect to continue."
+                })
+                await websocket.close(code=1011)
+                break
+
+            text = body.get("text")
+            current_time = datetime.utcnow().isoformat()
+            # Advance a copy; the cached turn is replaced, never mutated
+            draft = _fork_turn(turn)
+
+            if _is_exhausted(draft):
+                followup_result = {"continue_followup": False, "response": CLOSING_MESSAGE, "reason": "All interventions completed"}
+                await websocket.send_json({"type": "token", "text": CLOSING_MESSAGE})
+                current_active_reason = next_reason = None
+                _mark_all_asked(draft)
+                end_chat = True
+            else:
+                followup_result = None
+                async for kind, value in _stream_reply(draft, text, emp_id, llm_service):
+                    if kind == "token":
+                        await websocket.send_json({"type": "token", "text": value})
+                    elif kind == "result":
+                        followup_result = value
+                current_active_reason = draft["current_active_reason"]
+                next_reason = draft["next_reason"]
+                end_chat = _advance_interventions(draft, followup_result)
 
+            ai_response = followup_result["response"]
+            user_row = _conversation_row(session_id, emp_id, text, "user", current_time) if text else None
+            ai_row = _conversation_row(session_id, emp_id, ai_response, "ai", current_time)
+
+            writer.submit(_insert_conversations, [row for row in (user_row, ai_row) if row])
+            if not followup_result["continue_followup"]:
+                # Writes run in order, so the next transition can assume this one's version
+                writer.submit(_apply_transition, copy.deepcopy(draft["probable_reason"]), session_id if end_chat else None)
+                draft["probable_reason"]["version"] = draft["probable_reason"].get("version", 0) + 1
+            _record_exchange(draft, text, ai_response)
+            _keep_turn(emp_id, session_id, turn, draft, end_chat)
+            turn = draft
+            if not end_chat:
+                _schedule_compaction(session_id, turn, llm_service)
+
+            await websocket.send_json({
+                "type": "done",
+                "user_message": {
+                    "text": text,
+                    "created_at": current_time,
+                    "sent_by": "user",
+                    "id": user_row["id"]
+                } if user_row else None,
+                "ai_message": {
+                    "text": ai_response,
+                    "created_at": current_time,
+                    "sent_by": "ai",
+                    "id": ai_row["id"]
+                },
+                "status": "completed" if end_chat else "ongoing",
+                "current_reason": current_active_reason.get("reason") if current_active_reason else None,
+                "next_reason": next_reason.get("reason") if next_reason else None,
+                "decision_reason": followup_result.get("reason", "")
+            })
+
+            if end_chat:
+                completed = True
+                await websocket.close()
+                break
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Error in conversation socket: {str(e)}", exc_info=True)
+        await websocket.close(code=1011)
+    finally:
+        await writer.close()
+        # Only once the transcript is flushed (and every write landed) can the summary job read it
+        if completed and writer.error is None:
+            await websocket.app.state.summary_queue.enqueue(emp_id, session_id)
 
 
 @router.get("/{session_id}")
@@ -266,7 +641,7 @@ async def get_conversation( session_id: str, emp_id: str = Depends(get_employee_
             )
 
         try:
-            response = supabase.table("conversations") \
+            response = await supabase.table("conversations") \
                 .select("*") \
                 .eq("session_id", session_id) \
                 .eq("emp_id", emp_id) \
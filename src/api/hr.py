@@ -1,135 +1,93 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Cookie
+from fastapi import APIRouter, HTTPException, status, Depends
+from api.common import verify_hr_role, get_llm_service
+from services.llm import LLMService
 from services.supabase import supabase
+from services import rollups
+from services.cache import sentiment_cache, leaves_cache, daily_sessions_cache, escalated_chats_cache, period_ttl, day_ttl, cache_stats, invalidate_sessions
+from services.llm_cache import llm_result_cache
+from services import batch_scoring
+from services.risk_features import employee_features, ACTIVITY_METRICS, FEATURE_BASELINE_DAYS
+from services.prompt_data import window_start, AWARDS_WINDOW_DAYS, LEAVES_WINDOW_DAYS
 from models.schemas import Activity, EmployeeDashboard, User, Sessions, Leaves, Awards, PerformanceReview, VibeMeter, EscalatedSession, SessionDetail, SentimentDistribution, WorkHourDistribution, LeaveDistribution, InterventionSession, EscalatedChat
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import date, datetime, timedelta
 from sqlalchemy import func, desc
-from jose import JWTError, jwt
 import os
+import asyncio
 import calendar
-from collections import Counter
 
 router = APIRouter()
 
-# JWT Settings
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
-
-def get_escalated_list():
-    result = supabase.table("sessions")\
+async def get_escalated_list():
+    result = await supabase.table("sessions")\
         .select("*, user:emp_id(name)")\
         .eq("is_escalated", True)\
         .execute()
     return result
 
-def get_current_month_daily_sessions():
-    # Get current date
+async def count_sessions_by_period(
+    start: datetime,
+    end: datetime,
+    period: str,
+    slots: int,
+    escalated_only: bool = False
+) -> List[int]:
+    """Count sessions started in [start, end) per day or month.
+
+    The grouping runs on the database (date_trunc buckets), so only one row
+    per non-empty bucket comes back. Buckets past `slots` are dropped.
+    """
+    result = await supabase.rpc("session_counts", {
+        "p_start": start.isoformat(),
+        "p_end": end.isoformat(),
+        "p_period": period,
+        "p_escalated_only": escalated_only
+    }).execute()
+
+    counts = [0] * slots
+    for row in result.data or []:
+        bucket = datetime.fromisoformat(row["bucket"].replace('Z', '+00:00'))
+        index = (bucket.day if period == "day" else bucket.month) - 1
+        if index < slots:
+            counts[index] += row["total"]
+    return counts
+
+async def get_daily_session_counts(
+    year: int,
+    month: int,
+    days: Optional[int] = None,
+    escalated_only: bool = False
+) -> List[int]:
+    """Per-day session counts for a month, optionally truncated to the first `days` days"""
+    first_day = datetime(year, month, 1)
+    days_in_month = calendar.monthrange(year, month)[1]
+    next_month = first_day + timedelta(days=days_in_month)
+    return await count_sessions_by_period(first_day, next_month, "day", days or days_in_month, escalated_only)
+
+async def get_current_month_daily_sessions():
     now = datetime.now()
-    current_year = now.year
-    current_month = now.month
-    
-    # Calculate first and last day of the current month
-    first_day = datetime(current_year, current_month, 1)
-    last_day_num = calendar.monthrange(current_year, current_month)[1]
-    last_day = datetime(current_year, current_month, last_day_num, 23, 59, 59)
-    
-    # Format dates for Supabase query
-    first_day_str = first_day.isoformat()
-    last_day_str = last_day.isoformat()
-    
-    # Query sessions for current month
-    result = supabase.table("sessions")\
-        .select("*")\
-        .gte("started_at", first_day_str)\
-        .lte("started_at", last_day_str)\
-        .execute()
-    
-    # Get all sessions for the month
-    all_sessions = result.data
-    
-    # Initialize array with zeros for each day of the month
-    days_in_month = last_day_num
-    daily_counts = [0] * days_in_month
-    # Count sessions for each day
-    for session in all_sessions:
-        # Parse the created_at date
-        session_date = datetime.fromisoformat(session["started_at"].replace('Z', '+00:00'))
-        # Get the day (1-indexed)
-        day = session_date.day
-        print(f"Session date: {session_date}, Day: {day}")
-        # Increment count for that day (adjust to 0-indexed for array)
-        daily_counts[day - 1] += 1
-        print(f"Daily counts: {daily_counts}")
-    print(f"Final daily counts: {daily_counts}")
-    
-    return daily_counts
-
-def get_current_month_daily_escalations():
-    # Get current date
+    return await get_daily_session_counts(now.year, now.month)
+
+async def get_current_month_daily_escalations():
     now = datetime.now()
-    current_year = now.year
-    current_month = now.month
-    
-    # Calculate first and last day of the current month
-    first_day = datetime(current_year, current_month, 1)
-    last_day_num = calendar.monthrange(current_year, current_month)[1]
-    last_day = datetime(current_year, current_month, last_day_num, 23, 59, 59)
-    
-    # Format dates for Supabase query
-    first_day_str = first_day.isoformat()
-    last_day_str = last_day.isoformat()
-    
-    # Query sessions for current month
-    result = supabase.table("sessions")\
-        .select("*")\
-        .eq("is_escalated", True)\
-        .gte("started_at", first_day_str)\
-        .lte("started_at", last_day_str)\
+    return await get_daily_session_counts(now.year, now.month, escalated_only=True)
+
+async def get_interventions_by_session(session_ids: List[str]) -> Dict[str, list]:
+    """Fetch the interventions of many sessions in one query, keyed by session id"""
+    if not session_ids:
+        return {}
+
+    reasons_response = await supabase.table('probable_reasons')\
+        .select('session_id, interventions')\
+        .in_('session_id', session_ids)\
         .execute()
-    
-    # Get all sessions for the month
-    all_sessions = result.data
-    
-    # Initialize array with zeros for each day of the month
-    days_in_month = last_day_num
-    daily_counts = [0] * days_in_month
-    # Count sessions for each day
-    for session in all_sessions:
-        # Parse the created_at date
-        session_date = datetime.fromisoformat(session["started_at"].replace('Z', '+00:00'))
-        # Get the day (1-indexed)
-        day = session_date.day
-        print(f"Session date: {session_date}, Day: {day}")
-        # Increment count for that day (adjust to 0-indexed for array)
-        daily_counts[day - 1] += 1
-        print(f"Daily counts: {daily_counts}")
-    print(f"Final daily counts: {daily_counts}")
-    
-    return daily_counts
-
-
-
-
-async def verify_hr_role(auth_token: str = Cookie(...)):
-    if not auth_token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated"
-        )
-    
-    try:
-        payload = jwt.decode(auth_token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload.get("role") != "hr":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized. HR role required."
-            )
-        return payload
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication token"
-        )
+
+    interventions_by_session = {}
+    for row in reasons_response.data or []:
+        # Keep the first row per session, matching the old per-session lookup
+        interventions_by_session.setdefault(row['session_id'], row.get('interventions') or [])
+    return interventions_by_session
+
 
 @router.get("/employee/{emp_id}", response_model=EmployeeDashboard)
 async def get_employee_sessions(
@@ -137,61 +95,60 @@ async def get_employee_sessions(
     payload: dict = Depends(verify_hr_role)
 ):
     try:
-        # Get employee basic info
-        user_response = supabase.table('user').select('id, name').eq('id', emp_id).execute()
-        if not user_response.data:
+        # All nine lookups (and both counts) are done by one database-side call
+        dashboard_response = await supabase.rpc("employee_dashboard", {"p_emp_id": emp_id}).execute()
+        dashboard = dashboard_response.data
+        if not dashboard:
             raise HTTPException(status_code=404, detail="Employee not found")
-        
-        user_data = user_response.data[0]
-        
-        # Get sessions count for this month
-        current_month = datetime.now().month
-        sessions_response = supabase.table('sessions').select('id').eq('emp_id', emp_id).gte('started_at', f"{datetime.now().year}-{current_month:02d}-01").execute()
-        sessions_count = len(sessions_response.data)
-        
-        # Get last session date
-        last_session_response = supabase.table('sessions').select('started_at, is_escalated, vulnerability_score').eq('emp_id', emp_id).order('started_at', desc=True).limit(1).execute()
-        last_session = last_session_response.data[0] if last_session_response.data else None
-        last_session_date = last_session['started_at'] if last_session else None
-        
-        # Get latest mood
-        mood_response = supabase.table('vibemeter').select('mood').eq('emp_id', emp_id).order('created_at', desc=True).limit(1).execute()
-        current_mood = mood_response.data[0]['mood'] if mood_response.data else "Not Available"
-        
-        # Get latest leave
-        leave_response = supabase.table('leaves').select('*').eq('emp_id', emp_id).order('leave_start_date', desc=True).limit(1).execute()
-        latest_leave = leave_response.data[0] if leave_response.data else None
-        
-        # Get latest reward
-        reward_response = supabase.table('awards').select('*').eq('emp_id', emp_id).order('award_date', desc=True).limit(1).execute()
-        latest_reward = reward_response.data[0] if reward_response.data else None
-        
-        # Get latest performance review
-        performance_response = supabase.table('performance_reviews').select('*').eq('emp_id', emp_id).order('review_period', desc=True).limit(1).execute()
-        latest_performance = performance_response.data[0] if performance_response.data else None
-        
-        # Get latest activity
-        activity_response = supabase.table('activity').select('*').eq('emp_id', emp_id).order('date_msg', desc=True).limit(1).execute()
-        latest_activity = activity_response.data[0] if activity_response.data else None
-        
-        # Get escalations count for this year
-        escalations_response = supabase.table('sessions').select('id').eq('emp_id', emp_id).eq('status', 'escalated').gte('started_at', f"{datetime.now().year}-01-01").execute()
-        escalations_count = len(escalations_response.data)
-        
+
+        last_session = dashboard.get('last_session')
+
         return EmployeeDashboard(
-            emp_id=emp_id,
-            emp_name=user_data['name'],
+            emp_id=dashboard['emp_id'],
+            emp_name=dashboard['emp_name'],
             vulnerability_score=last_session['vulnerability_score'] if last_session and last_session.get('is_escalated') else 0.0,
-            sessions_this_month=sessions_count,
-            escalations_this_year=escalations_count,
-            last_session_date=last_session_date,
-            current_mood=current_mood,
-            latest_leave=latest_leave,
-            latest_reward=latest_reward,
-            latest_performance=latest_performance,
-            latest_activity=latest_activity
+            sessions_this_month=dashboard['sessions_this_month'],
+            escalations_this_year=dashboard['escalations_this_year'],
+            last_session_date=last_session['started_at'] if last_session else None,
+            current_mood=dashboard.get('current_mood') or "Not Available",
+            latest_leave=dashboard.get('latest_leave'),
+            latest_reward=dashboard.get('latest_reward'),
+            latest_performance=dashboard.get('latest_performance'),
+            latest_activity=dashboard.get('latest_activity')
         )
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/employee/{emp_id}/risk-features")
+async def get_employee_risk_features(
+    emp_id: str,
+    payload: dict = Depends(verify_hr_role)
+):
+    """Trend features (slopes, trailing means, baseline z-scores) computed from the employee's recent data"""
+    try:
+        baseline_start = window_start(FEATURE_BASELINE_DAYS)
+        vibes, activity, leaves, awards = await asyncio.gather(
+            supabase.table("vibemeter").select("created_at, mood, scale")
+                .eq("emp_id", emp_id).gte("created_at", baseline_start).execute(),
+            supabase.table("activity").select(", ".join(("date_msg",) + ACTIVITY_METRICS))
+                .eq("emp_id", emp_id).gte("date_msg", baseline_start).execute(),
+            supabase.table("leaves").select("leave_days")
+                .eq("emp_id", emp_id).gte("leave_end_date", window_start(LEAVES_WINDOW_DAYS)).execute(),
+            supabase.table("awards").select("award_date, reward_points")
+                .eq("emp_id", emp_id).gte("award_date", window_start(AWARDS_WINDOW_DAYS)).execute(),
+        )
+        return {
+            "emp_id": emp_id,
+            "features": employee_features(emp_id, {
+                "vibemeter": vibes.data or [],
+                "activity": activity.data or [],
+                "leaves": leaves.data or [],
+                "awards": awards.data or [],
+            })
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -204,12 +161,12 @@ async def get_escalated_sessions(
         print("Getting escalated sessions for employee:", emp_id)
 
         # Verify employee exists
-        user_response = supabase.table('user').select('id').eq('id', emp_id).execute()
+        user_response = await supabase.table('user').select('id').eq('id', emp_id).execute()
         if not user_response.data:
             raise HTTPException(status_code=404, detail="Employee not found")
 
         # Get escalated sessions
-        sessions_response = supabase.table('sessions').select(
+        sessions_response = await supabase.table('sessions').select(
             'id',
             'title',
             'summary',
@@ -219,18 +176,16 @@ async def get_escalated_sessions(
         if not sessions_response.data:
             return []
 
+        interventions_by_session = await get_interventions_by_session(
+            [session['id'] for session in sessions_response.data]
+        )
+
         escalated_sessions = []
 
         for session in sessions_response.data:
             session_id = session['id']
-
-            # Fetch reasons for each session
-            reasons_response = supabase.table('probable_reasons').select('interventions').eq('session_id', session_id).execute()
-            reasons = []
-
-            if reasons_response.data and reasons_response.data[0].get('interventions'):
-                interventions = reasons_response.data[0]['interventions']
-                reasons = [intervention['reason'] for intervention in interventions if 'reason' in intervention]
+            interventions = interventions_by_session.get(session_id, [])
+            reasons = [intervention['reason'] for intervention in interventions if 'reason' in intervention]
 
             escalated_sessions.append(
                 EscalatedSession(
@@ -256,29 +211,25 @@ async def get_session_details(
         # Get session details
         
         print("Getting session details for session:", session_id)
-        session_response = supabase.table('sessions').select(
-            'started_at',
-            'summary'
-        ).eq('id', session_id).execute()
+        session_response, interventions_by_session = await asyncio.gather(
+            supabase.table('sessions').select(
+                'started_at',
+                'summary'
+            ).eq('id', session_id).execute(),
+            get_interventions_by_session([session_id])
+        )
         
         if not session_response.data:
             raise HTTPException(status_code=404, detail="Session not found")
         
         session_data = session_response.data[0]
         
-        # Get probable reasons for this session
-        reasons_response = supabase.table('probable_reasons').select(
-            'interventions'
-        ).eq('session_id', session_id).execute()
-        
         reasons = []
         questions = []
         
-        if reasons_response.data and reasons_response.data[0].get('interventions'):
-            interventions = reasons_response.data[0]['interventions']
-            for intervention in interventions:
-                reasons.append(intervention['reason'])
-                questions.append(intervention['question'])
+        for intervention in interventions_by_session.get(session_id, []):
+            reasons.append(intervention['reason'])
+            questions.append(intervention['question'])
         
         return SessionDetail(
             date=session_data['started_at'],
@@ -297,12 +248,14 @@ async def unescalate_session(
 ):
     try:
         # First check if the session exists
-        session_response = supabase.table('sessions').select('id').eq('id', session_id).execute()
+        session_response = await supabase.table('sessions').select('id, started_at, is_escalated').eq('id', session_id).execute()
         if not session_response.data:
             raise HTTPException(status_code=404, detail="Session not found")
         
+        session_data = session_response.data[0]
+        
         # Update the session to set is_escalated to false
-        update_response = supabase.table('sessions')\
+        update_response = await supabase.table('sessions')\
             .update({"is_escalated": False})\
             .eq('id', session_id)\
             .execute()
@@ -310,6 +263,9 @@ async def unescalate_session(
         if not update_response.data:
             raise HTTPException(status_code=500, detail="Failed to update session")
         
+        await rollups.record_escalation_change(session_data['started_at'], session_data['is_escalated'], False)
+        invalidate_sessions(session_data['started_at'])
+        
         return {"message": "Session un-escalated successfully", "session_id": session_id}
         
     except Exception as e:
@@ -333,43 +289,26 @@ async def get_monthly_daily_sessions(
         if not (2000 <= year <= 2100):  # Reasonable year range
             raise HTTPException(status_code=400, detail="Year must be between 2000 and 2100")
 
-        # Calculate first and last day of the specified month
-        first_day = datetime(year, month, 1)
-        last_day_num = calendar.monthrange(year, month)[1]
-        last_day = datetime(year, month, last_day_num, 23, 59, 59)
+        cached = daily_sessions_cache.get((year, month))
+        if cached is not None:
+            return cached
 
         # Check if we're querying the current month
         is_current_month = (year == now.year and month == now.month)
-        days_to_count = now.day if is_current_month else last_day_num
-
-        # Format dates for database query
-        first_day_str = first_day.isoformat()
-        last_day_str = last_day.isoformat()
-
-        # Query sessions for the specified month
-        result = supabase.table("sessions")\
-            .select("*")\
-            .gte("started_at", first_day_str)\
-            .lte("started_at", last_day_str)\
-            .execute()
-
-        all_sessions = result.data
-        daily_counts = [0] * days_to_count
+        days_to_count = now.day if is_current_month else calendar.monthrange(year, month)[1]
 
-        # Count sessions for each day
-        for session in all_sessions:
-            session_date = datetime.fromisoformat(session["started_at"].replace('Z', '+00:00'))
-            day = session_date.day
-            if day <= days_to_count:  # Only count days up to current day for current month
-                daily_counts[day - 1] += 1
+        # Only count days up to current day for current month
+        daily_counts = await get_daily_session_counts(year, month, days=days_to_count)
 
-        return {
+        result = {
             "month": month,
             "year": year,
             "daily_counts": daily_counts,
             "is_current_month": is_current_month,
             "days_counted": days_to_count
         }
+        daily_sessions_cache.set((year, month), result, ttl=period_ttl(year, month))
+        return result
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -388,30 +327,14 @@ async def get_yearly_escalations(
         if not (2000 <= year <= 2100):  # Reasonable year range
             raise HTTPException(status_code=400, detail="Year must be between 2000 and 2100")
 
-        # Calculate first and last day of the year
-        first_day = datetime(year, 1, 1)
-        last_day = datetime(year, 12, 31, 23, 59, 59)
-
-        # Format dates for database query
-        first_day_str = first_day.isoformat()
-        last_day_str = last_day.isoformat()
-
-        # Query escalated sessions for the specified year
-        result = supabase.table("sessions")\
-            .select("*")\
-            .eq("is_escalated", True)\
-            .gte("started_at", first_day_str)\
-            .lte("started_at", last_day_str)\
-            .execute()
-
-        all_sessions = result.data
-        monthly_counts = [0] * 12  # Array for 12 months
-
         # Count escalated sessions for each month
-        for session in all_sessions:
-            session_date = datetime.fromisoformat(session["started_at"].replace('Z', '+00:00'))
-            month = session_date.month
-            monthly_counts[month - 1] += 1
+        monthly_counts = await count_sessions_by_period(
+            datetime(year, 1, 1),
+            datetime(year + 1, 1, 1),
+            "month",
+            12,
+            escalated_only=True
+        )
 
         return {
             "year": year,
@@ -434,32 +357,19 @@ async def get_sentiment_distribution(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
 
-        # Calculate start and end of the target date
-        start_of_day = datetime.combine(target_date, datetime.min.time())
-        end_of_day = datetime.combine(target_date, datetime.max.time())
+        cached = sentiment_cache.get(target_date.isoformat())
+        if cached is not None:
+            return cached
 
-        # Format dates for database query
-        start_str = start_of_day.isoformat()
-        end_str = end_of_day.isoformat()
-
-        # Query vibemeter entries for the specified date
-        result = supabase.table("vibemeter")\
-            .select("mood")\
-            .gte("created_at", start_str)\
-            .lte("created_at", end_str)\
+        # Read the per-day mood histogram maintained on every vibemeter submission
+        result = await supabase.table("daily_mood_rollup")\
+            .select("mood, entries")\
+            .eq("day", target_date.isoformat())\
+            .gt("entries", 0)\
             .execute()
 
-        if not result.data:
-            return SentimentDistribution(
-                date=target_date,
-                distribution={},
-                total_count=0
-            )
-
-        # Count occurrences of each mood
-        moods = [entry["mood"] for entry in result.data]
-        mood_counts = Counter(moods)
-        total_count = len(moods)
+        mood_counts = {entry["mood"]: entry["entries"] for entry in result.data}
+        total_count = sum(mood_counts.values())
 
         # Calculate percentage distribution
         distribution = {
@@ -467,11 +377,13 @@ async def get_sentiment_distribution(
             for mood, count in mood_counts.items()
         }
 
-        return SentimentDistribution(
+        sentiment = SentimentDistribution(
             date=target_date,
             distribution=distribution,
             total_count=total_count
         )
+        sentiment_cache.set(target_date.isoformat(), sentiment, ttl=day_ttl(target_date))
+        return sentiment
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -504,7 +416,7 @@ async def get_work_hours_distribution(
         end_str = week_end.isoformat()
 
         # Query work hours data for the week
-        result = supabase.table("activity")\
+        result = await supabase.table("activity")\
             .select("emp_id, work_hours, date_msg")\
             .gte("date_msg", start_str)\
             .lte("date_msg", end_str)\
@@ -564,38 +476,34 @@ async def get_leaves_distribution(
         if not (2000 <= year <= 2100):
             raise HTTPException(status_code=400, detail="Year must be between 2000 and 2100")
 
-        # Calculate first and last day of the year
-        first_day = datetime(year, 1, 1)
-        last_day = datetime(year, 12, 31, 23, 59, 59)
-
-        # Format dates for database query
-        first_day_str = first_day.isoformat()
-        last_day_str = last_day.isoformat()
-
-        # Query leaves for the specified year
-        result = supabase.table("leaves")\
-            .select("emp_id, leave_type")\
-            .gte("leave_start_date", first_day_str)\
-            .lte("leave_end_date", last_day_str)\
-            .execute()
-
-        if not result.data:
-            return LeaveDistribution(
-                year=year,
-                distribution={},
-                total_employees=0
-            )
+        cached = leaves_cache.get(year)
+        if cached is not None:
+            return cached
+
+        # Read the per-year leave rollups maintained by the leave write paths
+        types_result, employees_result = await asyncio.gather(
+            supabase.table("yearly_leave_rollup")\
+                .select("leave_type, leaves")\
+                .eq("year", year)\
+                .gt("leaves", 0)\
+                .execute(),
+            supabase.table("yearly_leave_employee_rollup")\
+                .select("emp_id", count="exact", head=True)\
+                .eq("year", year)\
+                .gt("leaves", 0)\
+                .execute()
+        )
 
-        # Count leaves by type
-        leave_types = [entry["leave_type"] for entry in result.data]
-        leave_counts = Counter(leave_types)
-        total_employees = len(set(entry["emp_id"] for entry in result.data))
+        leave_counts = {entry["leave_type"]: entry["leaves"] for entry in types_result.data or []}
+        total_employees = employees_result.count or 0
 
-        return LeaveDistribution(
+        distribution = LeaveDistribution(
             year=year,
-            distribution=dict(leave_counts),
+            distribution=leave_counts,
             total_employees=total_employees
         )
+        leaves_cache.set(year, distribution, ttl=period_ttl(year))
+        return distribution
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -615,7 +523,7 @@ async def get_intervention_sessions(
         end_str = end_of_day.isoformat()
 
         # Query today's sessions that need intervention but are not escalated
-        result = supabase.table("sessions")\
+        result = await supabase.table("sessions")\
             .select("*, user:emp_id(name)")\
             .eq("is_escalated", False)\
             .not_.is_("vulnerability_score", "null")\
@@ -652,8 +560,12 @@ async def get_escalated_chats(
     payload: dict = Depends(verify_hr_role)
 ):
     try:
+        cached = escalated_chats_cache.get("all")
+        if cached is not None:
+            return cached
+
         # Query sessions that are escalated and have vulnerability scores
-        result = supabase.table("sessions")\
+        result = await supabase.table("sessions")\
             .select("id, emp_id, vulnerability_score, started_at, user:emp_id(name)")\
             .eq("is_escalated", True)\
             .not_.is_("vulnerability_score", "null")\
@@ -685,7 +597,69 @@ async def get_escalated_chats(
         # Sort by vulnerability score (descending) and then by date (ascending)
         escalated_chats.sort(key=lambda x: (-x.vulnerability_score, x.last_session_date))
 
+        escalated_chats_cache.set("all", escalated_chats)
         return escalated_chats
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache-stats")
+async def get_cache_stats(
+    payload: dict = Depends(verify_hr_role)
+):
+    return {"caches": cache_stats(), "llm_results": llm_result_cache.stats()}
+
+@router.get("/llm-gateway")
+async def get_llm_gateway_stats(
+    payload: dict = Depends(verify_hr_role),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    return llm_service.stats()
+
+@router.post("/batch-scoring", status_code=status.HTTP_202_ACCEPTED)
+async def start_batch_scoring(
+    payload: dict = Depends(verify_hr_role),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """Start a workforce-wide scoring run in the background"""
+    try:
+        run = batch_scoring.start_batch_scoring(llm_service)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"run_id": run["id"], "status": run["status"]}
+
+@router.get("/batch-scoring/{run_id}")
+async def get_batch_scoring_run(
+    run_id: str,
+    payload: dict = Depends(verify_hr_role)
+):
+    run = batch_scoring.active_run()
+    if run is not None and run["id"] == run_id:
+        return run
+    try:
+        result = await supabase.table("scoring_runs").select("*").eq("id", run_id).execute()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Scoring run not found")
+    return result.data[0]
+
+@router.get("/risk-scores")
+async def get_risk_scores(
+    flagged_only: bool = True,
+    limit: int = 100,
+    offset: int = 0,
+    payload: dict = Depends(verify_hr_role)
+):
+    """Employees from the latest completed scoring run, riskiest first"""
+    try:
+        query = supabase.table("latest_employee_risk_scores").select("*")
+        if flagged_only:
+            query = query.eq("flagged", True)
+        result = await query \
+            .order("triage_score", desc=True) \
+            .range(offset, offset + limit - 1) \
+            .execute()
+        return result.data or []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -10,7 +10,7 @@ router = APIRouter()
 @router.post("/", response_model=Leaves)
 async def create_leave(leave: Leaves):
     try:
-        response = supabase.table("leave_records").insert(leave.dict()).execute()
+        response = await supabase.table("leave_records").insert(leave.dict()).execute()
         return response.data[0]
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -18,7 +18,7 @@ async def create_leave(leave: Leaves):
 @router.get("/", response_model=List[Leaves])
 async def read_leaves():
     try:
-        response = supabase.table("leave_records").select("*").execute()
+        response = await supabase.table("leave_records").select("*").execute()
         return response.data
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -26,7 +26,7 @@ async def read_leaves():
 @router.get("/employee", response_model=List[Leaves])
 async def read_employee_leaves(emp_id: str = Depends(get_employee_id)):
     try:
-        response = supabase.table("leave_records").select("*").eq("emp_id", emp_id).execute()
+        response = await supabase.table("leave_records").select("*").eq("emp_id", emp_id).execute()
         return response.data
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -34,7 +34,7 @@ async def read_employee_leaves(emp_id: str = Depends(get_employee_id)):
 @router.put("/employee/{leave_start_date}", response_model=Leaves)
 async def update_leave(  leave_start_date: date, leave: Leaves, emp_id: str = Depends(get_employee_id)):
     try:
-        response = supabase.table("leave_records").update(leave.dict()).eq("emp_id", emp_id).eq("leave_start_date", leave_start_date).execute()
+        response = await supabase.table("leave_records").update(leave.dict()).eq("emp_id", emp_id).eq("leave_start_date", leave_start_date).execute()
         if not response.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave record not found")
         return response.data[0]
@@ -44,7 +44,7 @@ async def update_leave(  leave_start_date: date, leave: Leaves, emp_id: str = De
 @router.delete("/employee/{leave_start_date}")
 async def delete_leave(  leave_start_date: date, emp_id: str = Depends(get_employee_id)):
     try:
-        response = supabase.table("leave_records").delete().eq("emp_id", emp_id).eq("leave_start_date", leave_start_date).execute()
+        response = await supabase.table("leave_records").delete().eq("emp_id", emp_id).eq("leave_start_date", leave_start_date).execute()
         if not response.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Leave record not found")
         return {"message": "Leave record deleted successfully"}
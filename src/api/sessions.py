@@ -10,7 +10,7 @@ router = APIRouter()
 async def read_employee_sessions(emp_id: str = Depends(get_employee_id)):
     try:
         print(emp_id)
-        response = supabase.table("sessions").select("*").eq("emp_id", emp_id).order("started_at", desc=True).execute()
+        response = await supabase.table("sessions").select("*").eq("emp_id", emp_id).order("started_at", desc=True).execute()
         if not response.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No sessions found for this employee.")
 
@@ -22,7 +22,7 @@ async def read_employee_sessions(emp_id: str = Depends(get_employee_id)):
 @router.get("/employee/{session_id}", response_model=Sessions)
 async def get_session(  session_id: str , emp_id: str = Depends(get_employee_id)):
     try:
-        response = supabase.table("sessions").select("*").eq("id", session_id).eq("emp_id", emp_id).single().execute()
+        response = await supabase.table("sessions").select("*").eq("id", session_id).eq("emp_id", emp_id).single().execute()
 
         # Handle case where no session is found
         if not response.data:
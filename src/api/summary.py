@@ -1,89 +1,95 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from api.common import get_employee_id
+from fastapi.responses import JSONResponse
+from api.common import get_employee_id, get_summary_queue
 from services.supabase import supabase
-from models.schemas import Sessions
-from typing import List, Optional, Dict, Any
-from datetime import datetime
-import json
-from services.llm import LLMService
+from services.summaries import SummaryQueue
+from typing import Dict, Any
 
 router = APIRouter()
-llm_service = LLMService()
+
+async def _get_session_summary(session_id: str, emp_id: str) -> Dict[str, Any]:
+    response = await supabase.table("sessions") \
+        .select("title, summary, identified_reason, vulnerability_score, is_escalated, summary_status") \
+        .eq("id", session_id) \
+        .eq("emp_id", emp_id) \
+        .execute()
+
+    if not response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found for this employee."
+        )
+    return response.data[0]
 
 @router.post("/{session_id}/")
-async def generate_summary(session_id: str, emp_id: str = Depends(get_employee_id)) -> Dict[str, Any]:
+async def generate_summary(
+    session_id: str,
+    wait: bool = False,
+    emp_id: str = Depends(get_employee_id),
+    summary_queue: SummaryQueue = Depends(get_summary_queue)
+) -> Dict[str, Any]:
+    """Queue a summary of the session.
+
+    Returns 202 with the job status right away; with `?wait=true` it waits for the
+    job and returns the summary, as this endpoint used to.
+    """
     try:
         print(f"Generating summary for session {session_id}, employee {emp_id}")
-        
-        conv_history = supabase.table("conversations") \
-            .select("conversation, sent_by, created_at") \
-            .eq("emp_id", emp_id) \
-            .eq("session_id", session_id) \
-            .order("created_at") \
-            .execute()
-        
-        chat_history = "\n".join(
-            f"{msg['sent_by']}: {msg['conversation']}" 
-            for msg in conv_history.data
-        ) if conv_history.data else "No conversation history"
+        await _get_session_summary(session_id, emp_id)
 
-        probable_reason = supabase.table("probable_reasons") \
-            .select("*") \
-            .eq("emp_id", emp_id) \
-            .eq("session_id", session_id) \
-            .single() \
-            .execute()
-        
-        interventions = probable_reason.data.get("interventions", [])
-        intervention_reasons = [intervention["reason"] for intervention in interventions]
+        job = await summary_queue.enqueue(emp_id, session_id)
+        if not wait or job["status"] == "claimed":
+            # A claimed job is running in another worker; its progress is polled the same way
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={"session_id": session_id, "status": "running" if job["status"] == "claimed" else job["status"]}
+            )
 
-        analysis = await llm_service.analyze_chats(
-            intervention_reasons=intervention_reasons,
-            chat_history=chat_history,
-            employee_name=emp_id
+        await job["done"].wait()
+        if job["status"] != "done":
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to generate summary: {job['error']}"
+            )
+
+        print("Summary generated successfully:", job["result"])
+        return job["result"]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error generating summary: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate summary: {str(e)}"
         )
 
-        summary_data = {
+@router.get("/{session_id}/")
+async def get_summary_status(
+    session_id: str,
+    emp_id: str = Depends(get_employee_id),
+    summary_queue: SummaryQueue = Depends(get_summary_queue)
+) -> Dict[str, Any]:
+    """Poll a session's summary: its job status, plus the stored summary once done"""
+    try:
+        # The in-memory job only knows its progress; once it has finished, the outcome
+        # (and the summary itself) comes from the session
+        job = summary_queue.get(session_id)
+        if job is not None and job["emp_id"] == emp_id and job["status"] in ("queued", "running"):
+            return {"session_id": session_id, "status": job["status"], "attempts": job["attempts"]}
+
+        session = await _get_session_summary(session_id, emp_id)
+        summary_status = session.pop("summary_status") or "not_started"
+        return {
             "session_id": session_id,
-            "employee_id": emp_id,
-            "analysis_date": datetime.utcnow().isoformat(),
-            "title" : analysis["title"],
-            "conversation_summary": analysis["summary"],
-            "identified_reason": analysis["identified_reason"],
-            "vulnerability_score": analysis["vulnerability_score"],
-            "escalation_required": analysis["escalation_required"],
+            "status": summary_status,
+            **(session if summary_status == "done" else {})
         }
 
-        try:
-            # Update session with summary data
-            update_data = {
-                "title" : analysis["title"],
-                "summary": analysis["summary"],
-                "vulnerability_score": analysis["vulnerability_score"]["value"],
-                "is_escalated": analysis["escalation_required"],
-                "ended_at": datetime.utcnow().isoformat(),
-                "status": "completed",
-                "identified_reason": analysis["identified_reason"]
-            }
-            
-            supabase.table("sessions") \
-                .update(update_data) \
-                .eq("id", session_id) \
-                .eq("emp_id", emp_id) \
-                .execute()
-            
-            
-        except Exception as db_error:
-            print(f"Database update failed: {str(db_error)}")
-
-        print("Summary generated successfully:", summary_data)
-        return summary_data
-
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error generating summary: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate summary: {str(e)}"
-        )
\ No newline at end of file
+            detail=f"Failed to fetch summary status: {str(e)}"
+        )
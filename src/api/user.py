@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from api.common import get_employee_id
 from api.hr import get_escalated_list, get_current_month_daily_sessions, get_current_month_daily_escalations
 from services.supabase import supabase
+from services.cache import hr_overview_cache
 from models.schemas import User
 from typing import List
 from passlib.context import CryptContext
@@ -15,7 +16,7 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 @router.get("/getdata")
 async def get_user_data(employee_id: str = Depends(get_employee_id)):
     try:
-        user_result = supabase.table("user")\
+        user_result = await supabase.table("user")\
             .select("id, role")\
             .eq("id", employee_id)\
             .execute()
@@ -23,7 +24,7 @@ async def get_user_data(employee_id: str = Depends(get_employee_id)):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
             
         if user_result.data and user_result.data[0]["role"] == "employee":
-            result = supabase.table("vibemeter")\
+            result = await supabase.table("vibemeter")\
                 .select("created_at")\
                 .eq("emp_id", employee_id)\
                 .order("created_at", desc=True)\
@@ -42,15 +43,19 @@ async def get_user_data(employee_id: str = Depends(get_employee_id)):
         
             return {"should_submit": should_submit, "role": "employee"}
         else:
-            escalated_list = get_escalated_list()
-            current_month_daily_sessions = get_current_month_daily_sessions()
-            current_month_daily_escalations = get_current_month_daily_escalations()
-            return {
-                "role": "hr",
-                "escalated_list": escalated_list,
-                "current_month_daily_sessions": current_month_daily_sessions,
-                "current_month_daily_escalations": current_month_daily_escalations
-            }
+            overview = hr_overview_cache.get("current")
+            if overview is None:
+                escalated_list = await get_escalated_list()
+                current_month_daily_sessions = await get_current_month_daily_sessions()
+                current_month_daily_escalations = await get_current_month_daily_escalations()
+                overview = {
+                    "role": "hr",
+                    "escalated_list": escalated_list,
+                    "current_month_daily_sessions": current_month_daily_sessions,
+                    "current_month_daily_escalations": current_month_daily_escalations
+                }
+                hr_overview_cache.set("current", overview)
+            return overview
     
     except Exception as e:
         raise HTTPException(
@@ -1,54 +1,136 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Cookie
-from api.common import get_employee_id
+from fastapi import APIRouter, HTTPException, status, Depends, Header
+from api.common import get_employee_id, get_llm_service
 from services.supabase import supabase
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
 import os
-from typing import Optional
-from services.llm import LLMService
+from typing import List, Optional, Tuple
+from services.llm import LLMService, LLMUnavailableError
+from models.schemas import InterventionDecision
+from services import rollups
+from services.cache import invalidate_vibes, invalidate_sessions
+from services.triage import triage, TRIAGE_ACTIVITY_DAYS
+from services.risk_features import employee_features, ACTIVITY_METRICS, FEATURE_BASELINE_DAYS
+from services.prompt_data import (
+    prompt_columns,
+    window_start,
+    VIBE_HISTORY_LIMIT,
+    AWARDS_WINDOW_DAYS,
+    LEAVES_WINDOW_DAYS,
+    PERFORMANCE_REVIEWS_LIMIT,
+)
+import asyncio
 import uuid
 router = APIRouter()
 
-llm_service = LLMService()
-
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
+# Ask for the decision and the opening message in one LLM call (the two-call path is the fallback)
+COMBINED_PLANNING = os.getenv("LLM_COMBINED_PLANNING", "true").lower() == "true"
 
 class VibeData(BaseModel):
     mood: str
     scale: int
 
-async def get_employee_id(auth_token: str = Cookie(None)):
-    print(auth_token)
-    if not auth_token:
+async def _fetch_rows(query) -> list:
+    """Execute a select builder and return its rows"""
+    response = await query.execute()
+    return response.data or []
+
+async def _find_submission(employee_id: str, idempotency_key: str) -> Tuple[Optional[dict], Optional[dict]]:
+    """The vibe and the intervention session an earlier attempt with this key stored, if any"""
+    vibes, sessions = await asyncio.gather(
+        _fetch_rows(
+            supabase.table("vibemeter")
+            .select(prompt_columns("vibemeter"))
+            .eq("emp_id", employee_id)
+            .eq("idempotency_key", idempotency_key)
+            .limit(1)
+        ),
+        _fetch_rows(
+            supabase.table("sessions")
+            .select("id, initial_conversation")
+            .eq("emp_id", employee_id)
+            .eq("idempotency_key", idempotency_key)
+            .limit(1)
+        ),
+    )
+    return (vibes[0] if vibes else None), (sessions[0] if sessions else None)
+
+def _session_started(employee_id: str, session_id: str, initial_conversation: Optional[str]) -> dict:
+    return {
+        "intervention_needed": True,
+        "session_id": session_id,
+        "emp_id": employee_id,
+        "message": "Intervention session started.",
+        "initial_conversation": initial_conversation,
+    }
+
+async def _start_intervention_session(session: dict, first_message: dict, interventions: list) -> str:
+    """Create the session, its opening question and its probable reasons in one transaction"""
+    response = await supabase.rpc("start_intervention_session", {
+        "p_session": session,
+        "p_first_message": first_message,
+        "p_interventions": interventions
+    }).execute()
+
+    if not response.data:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, 
-            detail="Not authenticated"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to start intervention session"
         )
-    
-    try:
-        payload = jwt.decode(auth_token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(payload)
-        employee_id = payload.get("sub")
-        
-        if employee_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
+    return response.data
+
+async def _plan_intervention(
+    llm_service: LLMService,
+    employee_id: str,
+    vibe_data: List[dict],
+    rewards_data: List[dict],
+    leave_data: List[dict],
+    performance_data: List[dict],
+    features: Optional[dict] = None
+) -> Tuple[InterventionDecision, Optional[str]]:
+    """Return the intervention decision and, when one is needed, the opening message"""
+    decision = None
+    if COMBINED_PLANNING:
+        try:
+            plan = await llm_service.plan_intervention(
+                employee_name=employee_id,
+                vibe_meter_data=vibe_data,
+                rewards_data=rewards_data,
+                leave_data=leave_data,
+                performance_data=performance_data,
+                features=features
             )
-        
-        return employee_id
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
+            if not plan.intervention_needed or plan.opening_message.strip():
+                return plan, plan.opening_message or None
+            # Usable decision without a message: only the second call is still needed
+            decision = plan
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            print(f"[WARN] Combined intervention planning failed, using separate calls: {e}")
+
+    if decision is None:
+        decision = await llm_service.analyze_employee_data(
+            vibe_meter_data=vibe_data,
+            rewards_data=rewards_data,
+            leave_data=leave_data,
+            performance_data=performance_data,
+            features=features
         )
+    if not decision.intervention_needed:
+        return decision, None
+
+    initial_conversation = await llm_service.generate_initial_message(
+        employee_name=employee_id,
+        vibe_meter_data=vibe_data,
+        probable_reasons=[p.reason for p in decision.interventions]
+    )
+    return decision, initial_conversation
 
 @router.get("/check")
 async def check_should_submit(employee_id: str = Depends(get_employee_id)):
     try:
-        result = supabase.table("vibemeter")\
+        result = await supabase.table("vibemeter")\
             .select("created_at")\
             .eq("emp_id", employee_id)\
             .order("created_at", desc=True)\
@@ -74,7 +156,18 @@ async def check_should_submit(employee_id: str = Depends(get_employee_id)):
         )
 
 @router.post("/submit")
-async def submit_vibe(vibe_data: VibeData, employee_id: str = Depends(get_employee_id)):
+async def submit_vibe(
+    vibe_data: VibeData,
+    employee_id: str = Depends(get_employee_id),
+    llm_service: LLMService = Depends(get_llm_service),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Store a vibe and start an intervention session when the analysis calls for one.
+
+    A client retrying a submission (e.g. after a 503 or a dropped connection)
+    sends the same Idempotency-Key header: the vibe is then stored and counted
+    once, and a session the first attempt already started is returned as is.
+    """
     try:
         now = datetime.utcnow().isoformat()
         
@@ -84,97 +177,114 @@ async def submit_vibe(vibe_data: VibeData, employee_id: str = Depends(get_employ
             "scale": vibe_data.scale,
             "created_at": now
         }
+
+        stored_vibe = None
+        if idempotency_key:
+            insert_data["idempotency_key"] = idempotency_key
+            stored_vibe, started_session = await _find_submission(employee_id, idempotency_key)
+            if stored_vibe and (stored_vibe["mood"], stored_vibe["scale"]) != (vibe_data.mood, vibe_data.scale):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="This Idempotency-Key was already used for a different submission."
+                )
+            if started_session:
+                return _session_started(employee_id, started_session["id"], started_session["initial_conversation"])
         
-        supabase.table("vibemeter").insert(insert_data).execute()
+        # The context reads are independent of each other, so run them concurrently.
+        # The new entry is stored afterwards together with its triage result.
+        previous_vibes, rewards_data, leave_data, performance_data, activity_data = await asyncio.gather(
+            _fetch_rows(
+                supabase.table("vibemeter")
+                .select(f"{prompt_columns('vibemeter')}, idempotency_key")
+                .eq("emp_id", employee_id)
+                .order("created_at", desc=True)
+                .limit(VIBE_HISTORY_LIMIT)
+            ),
+            _fetch_rows(
+                supabase.table("awards")
+                .select(prompt_columns("awards"))
+                .eq("emp_id", employee_id)
+                .gte("award_date", window_start(AWARDS_WINDOW_DAYS))
+                .order("award_date", desc=True)
+            ),
+            _fetch_rows(
+                # Any leave that overlaps the window, including one still running
+                supabase.table("leaves")
+                .select(prompt_columns("leaves"))
+                .eq("emp_id", employee_id)
+                .gte("leave_end_date", window_start(LEAVES_WINDOW_DAYS))
+                .order("leave_start_date", desc=True)
+            ),
+            _fetch_rows(
+                supabase.table("performance_reviews")
+                .select(prompt_columns("performance_reviews"))
+                .eq("emp_id", employee_id)
+                .order("review_period", desc=True)
+                .limit(PERFORMANCE_REVIEWS_LIMIT)
+            ),
+            _fetch_rows(
+                # The longer window gives the risk features a baseline to compare against
+                supabase.table("activity")
+                .select(", ".join(("date_msg",) + ACTIVITY_METRICS))
+                .eq("emp_id", employee_id)
+                .gte("date_msg", window_start(max(TRIAGE_ACTIVITY_DAYS, FEATURE_BASELINE_DAYS)))
+            ),
+        )
+        # On a retry the first attempt's vibe stands in for the new one, so nothing is
+        # stored or counted twice and the retry sends the same prompt data (which lets
+        # the LLM cache answer it). The history query reads one row more than is used, so
+        # dropping that vibe from it still leaves a full history.
+        if idempotency_key:
+            previous_vibes = [row for row in previous_vibes if row.get("idempotency_key") != idempotency_key]
+        vibe_data = [stored_vibe or insert_data] + previous_vibes[:VIBE_HISTORY_LIMIT - 1]
+        features = employee_features(employee_id, {
+            "vibemeter": vibe_data,
+            "activity": activity_data,
+            "leaves": leave_data,
+            "awards": rewards_data,
+        })
+        activity_start = window_start(TRIAGE_ACTIVITY_DAYS)
+        recent_activity = [row for row in activity_data if str(row["date_msg"]) >= activity_start]
 
+        # Only submissions that score as risky go on to the LLM analysis
+        gate = triage(vibe_data, leave_data, recent_activity, features)
+        insert_data["triage_score"] = gate["score"]
+        insert_data["triage_escalated"] = gate["escalate"]
 
-        result = supabase.table("vibemeter")\
-            .select("mood")\
-            .eq("emp_id", employee_id)\
-            .order("created_at", desc=True)\
-            .limit(3)\
-            .execute()
-        
-        intervention_required = True
-        
-        # if result.data:
-        #     for entry in result.data:
-        #         if entry["mood"] not in ["Angry", "Sad"]:
-        #             intervention_required = False
-        #             break
-                
-        if not intervention_required:
+        if stored_vibe is None:
+            await asyncio.gather(
+                supabase.table("vibemeter").insert(insert_data).execute(),
+                rollups.record_vibe(now, insert_data["mood"]),
+            )
+            invalidate_vibes(now)
+
+        if not gate["escalate"]:
             return {
                 "intervention_required": False,
                 "message": "No intervention needed at this time."
             }
-        
-        vibe_data = (
-            supabase.table("vibemeter")
-            .select("*")
-            .eq("emp_id", employee_id)
-            .order("created_at", desc=True)
-            .limit(10)
-            .execute()
-        ).data
 
-        rewards_data = (
-            supabase.table("awards")
-            .select("*")
-            .eq("emp_id", employee_id)
-            .execute()
-        ).data
-
-        leave_data = (
-            supabase.table("leaves")
-            .select("*")
-            .eq("emp_id", employee_id)
-            .execute()
-        ).data
-
-        performance_data = (
-            supabase.table("performance_reviews")
-            .select("*")
-            .eq("emp_id", employee_id)
-            .limit(1)
-            .execute()
-        ).data
-
-        decision = await llm_service.analyze_employee_data(
-            vibe_meter_data=vibe_data,
-            rewards_data=rewards_data,
-            leave_data=leave_data,
-            performance_data=performance_data
+        decision, initial_conversation = await _plan_intervention(
+            llm_service, employee_id, vibe_data, rewards_data, leave_data, performance_data, features
         )
 
         if decision.intervention_needed:
-            initial_conversation = await llm_service.generate_initial_message(
-                employee_name=employee_id,
-                vibe_meter_data=vibe_data,
-                probable_reasons=[p.reason for p in decision.interventions]
-            )
-            
             session = {
                 "id": str(uuid.uuid4()), 
                 "emp_id": employee_id,
                 "started_at": datetime.utcnow().isoformat(),
                 "title": "Employee Wellbeing Intervention",
                 "status": "active",
-                "initial_conversation": initial_conversation
+                "initial_conversation": initial_conversation,
+                "idempotency_key": idempotency_key
             }
-            session_response = supabase.table("sessions").insert(session).execute()
-            session_id = session_response.data[0]["id"]
 
             firstQ = {
-                "session_id":session_id,
                 "emp_id": employee_id,
                 "conversation": decision.interventions[0].question ,
                 "sent_by": "ai",
                 "created_at": datetime.utcnow().isoformat(),
                 }
-            
-            supabase.table("conversations").insert(firstQ).execute()
-            
 
             # Create list of dicts: [{reason, question, asked: False}, ...]
             interventions_json = [
@@ -187,20 +297,16 @@ async def submit_vibe(vibe_data: VibeData, employee_id: str = Depends(get_employ
                 for intervention in decision.interventions
             ]
 
-            supabase.table("probable_reasons").insert({
-                "session_id": session_id,
-                "emp_id": employee_id,
-                "interventions": interventions_json
-            }).execute()
-
+            session_id = await _start_intervention_session(session, firstQ, interventions_json)
+            if str(session_id) == session["id"]:
+                await rollups.record_session(session["started_at"])
+                invalidate_sessions(session["started_at"])
+            else:
+                # A concurrent attempt with the same key started the session first
+                _, started_session = await _find_submission(employee_id, idempotency_key)
+                initial_conversation = started_session["initial_conversation"]
 
-            return {
-                "intervention_needed": True,
-                "session_id": session_id,
-                "emp_id": employee_id,
-                "message": "Intervention session started.",
-                "initial_conversation": initial_conversation,
-            }
+            return _session_started(employee_id, session_id, initial_conversation)
         else:
             return {
                 "intervention_needed": False,
@@ -211,6 +317,12 @@ async def submit_vibe(vibe_data: VibeData, employee_id: str = Depends(get_employ
     except HTTPException as http_exc:
         print(f"[ERROR] HTTP Exception: {http_exc.detail}")
         raise http_exc
+    except LLMUnavailableError as le:
+        print(f"[ERROR] LLM unavailable: {le}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analysis is temporarily unavailable. Please try again shortly."
+        )
     except ValueError as ve:
         print(f"[ERROR] Value Error: {ve}")
         raise HTTPException(
@@ -1,10 +1,13 @@
 from fastapi import FastAPI
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+import asyncio
 import os
 
 load_dotenv()
 APP_NAME = os.getenv("APP_NAME")
 FRONTEND_URL = os.getenv('FRONTEND_URL')
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() == "true"
 
 # Import routers
 from api.activity import router as activity_router
@@ -19,7 +22,29 @@ from api.conversation import router as conversation_router
 from api.auth import router as auth_router
 from api.hr import router as hr_router
 from api.summary import router as summary_router
-app = FastAPI(title=APP_NAME)
+from services.supabase import close_supabase
+from services.passwords import shutdown_password_pool
+from services.llm import LLMService
+from services.summaries import SummaryQueue
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One LLM client per worker, shared by every router
+    app.state.llm_service = LLMService()
+    if LLM_WARMUP:
+        # Load langchain/Gemini in the background so startup isn't blocked on it
+        app.state.llm_warm_up = asyncio.create_task(asyncio.to_thread(app.state.llm_service.warm_up))
+    # Background workers that summarize sessions once their chat completes
+    app.state.summary_queue = SummaryQueue(app.state.llm_service)
+    app.state.summary_queue.start()
+    yield
+    await app.state.summary_queue.close()
+    await close_supabase()
+    shutdown_password_pool()
+
+
+app = FastAPI(title=APP_NAME, lifespan=lifespan)
 
 # Register routers
 app.include_router(activity_router, prefix="/activity", tags=["Activity"])
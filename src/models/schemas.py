@@ -109,6 +109,12 @@ class InterventionDecision(BaseModel):
     confidence_score: float = Field(description="Confidence score between 0 and 1")
     interventions: List[InterventionPrompt] = Field(description="List of reasons with associated questions")
 
+class InterventionPlan(InterventionDecision):
+    opening_message: str = Field(
+        default="",
+        description="Warm, empathetic opening message (2-3 short paragraphs) when an intervention is needed, otherwise empty"
+    )
+
 
 class ReasonAnalysis(BaseModel):
     identified_reason: str = Field(description="The core reason identified from the conversation")
@@ -0,0 +1,262 @@
+from services.supabase import supabase
+from services.llm import LLMService, LLMUnavailableError, LLM_BATCH_PRIORITY
+from services.triage import triage, TRIAGE_ACTIVITY_DAYS, TRIAGE_THRESHOLD
+from services.risk_features import features_by_employee, ACTIVITY_METRICS, FEATURE_BASELINE_DAYS
+from services.prompt_data import (
+    prompt_columns,
+    window_start,
+    VIBE_HISTORY_LIMIT,
+    AWARDS_WINDOW_DAYS,
+    LEAVES_WINDOW_DAYS,
+    PERFORMANCE_REVIEWS_LIMIT,
+)
+from collections import defaultdict
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import uuid
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Workforce-wide intervention scoring (sql/009_batch_scoring.sql). Every source
+# is read in a handful of paged bulk queries, each employee is triaged in one
+# pass over the grouped rows, and only flagged employees are sent to
+# analyze_employee_data, a bounded number at a time and behind all interactive
+# LLM traffic. Run it nightly with scripts/score_workforce.py or POST /hr/batch-scoring.
+
+# Rows per request. A PostgREST max-rows setting below it (1000 on Supabase) only makes pages smaller
+BATCH_PAGE_SIZE = int(os.getenv("BATCH_PAGE_SIZE", "1000"))
+# Vibes older than this don't affect the triage or the prompt's latest-N history
+BATCH_VIBE_WINDOW_DAYS = int(os.getenv("BATCH_VIBE_WINDOW_DAYS", "90"))
+BATCH_THRESHOLD = float(os.getenv("BATCH_THRESHOLD", str(TRIAGE_THRESHOLD)))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+BATCH_WRITE_CHUNK = int(os.getenv("BATCH_WRITE_CHUNK", "500"))
+
+# The run in progress in this worker, if any, and the task executing it
+_active_run: Optional[Dict[str, Any]] = None
+_active_task: Optional[asyncio.Task] = None
+
+
+def _quoted(value: Any) -> str:
+    """A PostgREST filter value, quoted so timestamps and free text survive the or=() syntax"""
+    return '"%s"' % str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+async def _fetch_all(table: str, columns: str, order: str, desc: bool = False,
+                     gte: Optional[tuple] = None, lte: Optional[tuple] = None) -> List[Dict[str, Any]]:
+    """Read every matching row of a table, at most BATCH_PAGE_SIZE rows per request.
+
+    Pages follow the (order, emp_id) key: each one starts after the last key of
+    the previous page, so rows written meanwhile can't shift later pages. Rows
+    sharing the last key of a page (one employee, same date) are read together
+    in one extra request, so a tie is never split across pages. The loop ends on
+    an empty page, so a server max-rows below BATCH_PAGE_SIZE only shrinks pages.
+    """
+    def query():
+        # A row without a key value can't be paged past, and carries no date to score anyway
+        builder = supabase.table(table).select(columns).not_.is_(order, "null")
+        if gte is not None:
+            builder = builder.gte(*gte)
+        if lte is not None:
+            builder = builder.lte(*lte)
+        return builder
+
+    rows: List[Dict[str, Any]] = []
+    after: Optional[Tuple[Any, Any]] = None
+    while True:
+        page_query = query()
+        if after is not None:
+            value, emp_id = map(_quoted, after)
+            page_query = page_query.or_(f"{order}.gt.{value},and({order}.eq.{value},emp_id.gt.{emp_id})")
+        response = await page_query \
+            .order(order) \
+            .order("emp_id") \
+            .limit(BATCH_PAGE_SIZE) \
+            .execute()
+        page = response.data or []
+        if not page:
+            break
+
+        after = (page[-1][order], page[-1]["emp_id"])
+        rows.extend(row for row in page if (row[order], row["emp_id"]) != after)
+        tie = await query().eq(order, after[0]).eq("emp_id", after[1]).execute()
+        rows.extend(tie.data or [])
+
+    if desc:
+        rows.reverse()
+    return rows
+
+
+async def _load_employee_data() -> Tuple[Dict[str, Dict[str, List[Dict[str, Any]]]], Dict[str, Dict[str, Any]]]:
+    """Every employee's recent vibes, awards, leaves, reviews and activity, and their risk features, keyed by emp_id.
+
+    Each source is filtered and ordered as /vibemeter/submit does for one employee.
+    The features are computed over the full windows, before the per-employee limits.
+    """
+    # Vibes submitted while the run reads are left for the next run
+    cutoff = datetime.now(timezone.utc).isoformat()
+    vibes, awards, leaves, reviews, activity = await asyncio.gather(
+        _fetch_all("vibemeter", f"emp_id, {prompt_columns('vibemeter')}", "created_at", desc=True,
+                   gte=("created_at", window_start(BATCH_VIBE_WINDOW_DAYS)), lte=("created_at", cutoff)),
+        _fetch_all("awards", f"emp_id, {prompt_columns('awards')}", "award_date", desc=True,
+                   gte=("award_date", window_start(AWARDS_WINDOW_DAYS))),
+        _fetch_all("leaves", f"emp_id, {prompt_columns('leaves')}", "leave_start_date", desc=True,
+                   gte=("leave_end_date", window_start(LEAVES_WINDOW_DAYS))),
+        _fetch_all("performance_reviews", f"emp_id, {prompt_columns('performance_reviews')}", "review_period", desc=True),
+        _fetch_all("activity", ", ".join(("emp_id", "date_msg") + ACTIVITY_METRICS), "date_msg",
+                   gte=("date_msg", window_start(max(TRIAGE_ACTIVITY_DAYS, FEATURE_BASELINE_DAYS)))),
+    )
+    activity_start = window_start(TRIAGE_ACTIVITY_DAYS)
+
+    employees: Dict[str, Dict[str, List[Dict[str, Any]]]] = defaultdict(
+        lambda: {"vibemeter": [], "awards": [], "leaves": [], "performance_reviews": [], "activity": []}
+    )
+    limits = {"vibemeter": VIBE_HISTORY_LIMIT, "performance_reviews": PERFORMANCE_REVIEWS_LIMIT}
+    for source, rows in (("vibemeter", vibes), ("awards", awards), ("leaves", leaves),
+                         ("performance_reviews", reviews), ("activity", activity)):
+        limit = limits.get(source)
+        for row in rows:
+            bucket = employees[row["emp_id"]][source]
+            if source == "activity" and str(row["date_msg"]) < activity_start:
+                continue
+            if limit is None or len(bucket) < limit:
+                bucket.append(row)
+
+    features = await asyncio.to_thread(features_by_employee, {
+        "vibemeter": vibes,
+        "activity": activity,
+        "leaves": leaves,
+        "awards": awards,
+    }, list(employees))
+    return employees, features
+
+
+async def _analyze(llm_service: LLMService, semaphore: asyncio.Semaphore,
+                   data: Dict[str, List[Dict[str, Any]]], features: Dict[str, Any], result: Dict[str, Any]) -> None:
+    async with semaphore:
+        try:
+            decision = await llm_service.analyze_employee_data(
+                vibe_meter_data=data["vibemeter"],
+                rewards_data=data["awards"],
+                leave_data=data["leaves"],
+                performance_data=data["performance_reviews"],
+                features=features,
+                priority=LLM_BATCH_PRIORITY
+            )
+            result["intervention_needed"] = decision.intervention_needed
+            result["confidence_score"] = decision.confidence_score
+            result["interventions"] = [intervention.dict() for intervention in decision.interventions]
+        except LLMUnavailableError as e:
+            result["error"] = f"LLM unavailable: {str(e)}"
+        except Exception as e:
+            logger.error(f"Batch analysis of {result['emp_id']} failed: {str(e)}")
+            result["error"] = str(e)
+
+
+async def _write_results(results: List[Dict[str, Any]]) -> None:
+    for start in range(0, len(results), BATCH_WRITE_CHUNK):
+        await supabase.table("employee_risk_scores") \
+            .upsert(results[start:start + BATCH_WRITE_CHUNK], on_conflict="run_id,emp_id") \
+            .execute()
+
+
+async def run_batch_scoring(llm_service: LLMService, run: Dict[str, Any]) -> Dict[str, Any]:
+    """Score every employee and store the results under `run["id"]`; returns the run's counters"""
+    await supabase.table("scoring_runs").insert({
+        "id": run["id"],
+        "started_at": run["started_at"],
+        "status": "running"
+    }).execute()
+
+    try:
+        employees, features = await _load_employee_data()
+        run["employees"] = len(employees)
+
+        results = []
+        flagged = []
+        scored_at = datetime.utcnow().isoformat()
+        for emp_id, data in employees.items():
+            gate = triage(data["vibemeter"], data["leaves"], data["activity"], features[emp_id])
+            result = {
+                "run_id": run["id"],
+                "emp_id": emp_id,
+                "triage_score": gate["score"],
+                "signals": gate["signals"],
+                "features": features[emp_id],
+                "flagged": gate["score"] >= BATCH_THRESHOLD,
+                "intervention_needed": None,
+                "confidence_score": None,
+                "interventions": None,
+                "error": None,
+                "scored_at": scored_at,
+            }
+            results.append(result)
+            if result["flagged"]:
+                flagged.append((data, features[emp_id], result))
+        run["flagged"] = len(flagged)
+        logger.info(f"Batch scoring {run['id']}: {run['employees']} employees, {run['flagged']} flagged")
+
+        semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+        await asyncio.gather(*(_analyze(llm_service, semaphore, *job) for job in flagged))
+        run["failed"] = sum(1 for _, _, result in flagged if result["error"])
+        run["analyzed"] = run["flagged"] - run["failed"]
+
+        await _write_results(results)
+        run["status"] = "completed"
+    except Exception as e:
+        logger.error(f"Batch scoring {run['id']} failed: {str(e)}", exc_info=True)
+        run["status"] = "failed"
+        run["error"] = str(e)
+
+    run["finished_at"] = datetime.utcnow().isoformat()
+    await supabase.table("scoring_runs").update({
+        key: run[key] for key in ("finished_at", "status", "employees", "flagged", "analyzed", "failed", "error")
+    }).eq("id", run["id"]).execute()
+    return run
+
+
+def new_run() -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "started_at": datetime.utcnow().isoformat(),
+        "finished_at": None,
+        "status": "running",
+        "employees": 0,
+        "flagged": 0,
+        "analyzed": 0,
+        "failed": 0,
+        "error": None,
+    }
+
+
+def active_run() -> Optional[Dict[str, Any]]:
+    return _active_run
+
+
+def start_batch_scoring(llm_service: LLMService) -> Dict[str, Any]:
+    """Start a run in the background, or raise RuntimeError when one is already running here"""
+    global _active_run, _active_task
+    if _active_run is not None:
+        raise RuntimeError(f"Batch scoring run {_active_run['id']} is already in progress")
+
+    run = new_run()
+    _active_run = run
+
+    async def execute():
+        global _active_run, _active_task
+        try:
+            await run_batch_scoring(llm_service, run)
+        except Exception as e:
+            logger.error(f"Batch scoring {run['id']} could not be recorded: {str(e)}")
+            run["status"] = "failed"
+        finally:
+            _active_run = None
+            _active_task = None
+
+    _active_task = asyncio.create_task(execute())
+    return run
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from datetime import date, datetime
+from dotenv import load_dotenv
+from typing import Any, Dict, Hashable, Optional, Union
+import os
+import time
+
+load_dotenv()
+
+# TTLs in seconds. Current-period results change with every write; past months
+# and years no longer receive sessions, vibes or leaves, so they live much longer.
+CURRENT_PERIOD_TTL = int(os.getenv("CACHE_CURRENT_PERIOD_TTL", "60"))
+PAST_PERIOD_TTL = int(os.getenv("CACHE_PAST_PERIOD_TTL", "86400"))
+ESCALATED_CHATS_TTL = int(os.getenv("CACHE_ESCALATED_CHATS_TTL", "30"))
+HR_OVERVIEW_TTL = int(os.getenv("CACHE_HR_OVERVIEW_TTL", "30"))
+# Conversation turn state is refreshed on every turn, so its TTL is an idle timeout
+SESSION_STATE_CACHE_SIZE = int(os.getenv("SESSION_STATE_CACHE_SIZE", "1000"))
+SESSION_STATE_IDLE_TTL = int(os.getenv("SESSION_STATE_IDLE_TTL", "900"))
+
+
+class TTLCache:
+    """Bounded in-process LRU cache with per-entry expiry and hit/miss counters"""
+
+    def __init__(self, name: str, maxsize: int = 128, ttl: int = CURRENT_PERIOD_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None when missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None) -> None:
+        self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def replace(self, key: Hashable, expected: Any, value: Any, ttl: Optional[int] = None) -> bool:
+        """Compare-and-set: store `value` only while `key` still holds `expected` (the same object).
+
+        Otherwise the entry is dropped, so the next reader reloads it, and False is returned.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic() or entry[1] is not expected:
+            self._entries.pop(key, None)
+            return False
+        self.set(key, value, ttl)
+        return True
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one key, or every entry when no key is given"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+sentiment_cache = TTLCache("sentiment_distribution", maxsize=366)
+leaves_cache = TTLCache("leaves_distribution", maxsize=32)
+daily_sessions_cache = TTLCache("daily_session_counts", maxsize=64)
+escalated_chats_cache = TTLCache("escalated_chats", maxsize=1, ttl=ESCALATED_CHATS_TTL)
+hr_overview_cache = TTLCache("hr_overview", maxsize=1, ttl=HR_OVERVIEW_TTL)
+session_state_cache = TTLCache("conversation_sessions", maxsize=SESSION_STATE_CACHE_SIZE, ttl=SESSION_STATE_IDLE_TTL)
+
+ALL_CACHES = [sentiment_cache, leaves_cache, daily_sessions_cache, escalated_chats_cache, hr_overview_cache, session_state_cache]
+
+
+def period_ttl(year: int, month: Optional[int] = None) -> int:
+    """Long TTL for a finished month/year, short TTL for the current one"""
+    now = datetime.now()
+    if month is None:
+        return PAST_PERIOD_TTL if year < now.year else CURRENT_PERIOD_TTL
+    return PAST_PERIOD_TTL if (year, month) < (now.year, now.month) else CURRENT_PERIOD_TTL
+
+
+def day_ttl(day: date) -> int:
+    """Long TTL for a past day, short TTL for today"""
+    return PAST_PERIOD_TTL if day < date.today() else CURRENT_PERIOD_TTL
+
+
+def cache_stats() -> list:
+    return [cache.stats() for cache in ALL_CACHES]
+
+
+def _as_date(value: Union[str, date, datetime]) -> date:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.date() if isinstance(value, datetime) else value
+
+
+# Invalidation hooks, called by the write paths after they commit
+
+def invalidate_vibes(created_at: Union[str, date, datetime]) -> None:
+    sentiment_cache.invalidate(_as_date(created_at).isoformat())
+
+
+def invalidate_sessions(started_at: Union[str, date, datetime]) -> None:
+    day = _as_date(started_at)
+    daily_sessions_cache.invalidate((day.year, day.month))
+    escalated_chats_cache.invalidate()
+    hr_overview_cache.invalidate()
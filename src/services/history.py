@@ -0,0 +1,68 @@
+from dotenv import load_dotenv
+from typing import List, Optional
+import os
+
+load_dotenv()
+
+# Rolling compaction of conversation history for LLM prompts. The newest
+# messages are sent verbatim; older ones are folded into a running summary that
+# is stored on the session and extended a batch at a time, so the history part
+# of a prompt stays roughly the same size however long the chat gets.
+HISTORY_RECENT_MESSAGES = int(os.getenv("HISTORY_RECENT_MESSAGES", "8"))
+# Fold only once this many messages have left the verbatim window, so the
+# summariser runs every few turns rather than on every one
+HISTORY_FOLD_BATCH = int(os.getenv("HISTORY_FOLD_BATCH", "4"))
+HISTORY_TOKEN_BUDGETS = {
+    "followup": int(os.getenv("HISTORY_TOKEN_BUDGET_FOLLOWUP", "1200")),
+    "analysis": int(os.getenv("HISTORY_TOKEN_BUDGET_ANALYSIS", "4000")),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count; Gemini averages about four characters per token on English text"""
+    return (len(text) + 3) // 4
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Keep the end of `text` (the most recently summarised part) within max_tokens"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return "..." + text[-max_chars:].split(" ", 1)[-1]
+
+
+def pending_fold(lines: List[str], summarized: int) -> List[str]:
+    """The messages that should be folded into the summary now (empty until a full batch is waiting)"""
+    end = len(lines) - HISTORY_RECENT_MESSAGES
+    if end - summarized < HISTORY_FOLD_BATCH:
+        return []
+    return lines[summarized:end]
+
+
+def compact_history(lines: List[str], summary: Optional[str], summarized: int, prompt_type: str) -> str:
+    """Render the summary plus the unsummarised messages within the prompt type's token budget.
+
+    The summary gets at most half of the budget; messages fill the rest newest-first,
+    so when a fold is lagging behind it is the oldest messages that are dropped.
+    Returns an empty string when there is no history at all.
+    """
+    budget = HISTORY_TOKEN_BUDGETS[prompt_type]
+    summary = _truncate(summary, budget // 2) if summary else ""
+    remaining = budget - estimate_tokens(summary)
+
+    kept = []
+    for line in reversed(lines[summarized:]):
+        cost = estimate_tokens(line) + 1
+        if kept and cost > remaining:
+            break
+        kept.append(line)
+        remaining -= cost
+    kept.reverse()
+
+    recent = "\n".join(kept)
+    omitted = len(lines) - summarized - len(kept)
+    if omitted:
+        recent = f"[{omitted} earlier messages omitted]\n{recent}"
+    if not summary:
+        return recent
+    return f"Summary of earlier conversation:\n{summary}\n\nRecent messages:\n{recent}"
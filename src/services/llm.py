@@ -1,30 +1,748 @@
+from collections import deque
+from contextlib import aclosing, asynccontextmanager
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.output_parsers import PydanticOutputParser
-from typing import List, Dict, Any, Optional
-from models.schemas import InterventionDecision, ReasonAnalysis
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional
+from models.schemas import InterventionDecision, InterventionPlan, ReasonAnalysis
+from services.llm_cache import llm_result_cache
+from services.risk_features import format_features
+from services.prompt_data import (
+    format_prompt_data,
+    VIBE_HISTORY_LIMIT,
+    AWARDS_WINDOW_DAYS,
+    LEAVES_WINDOW_DAYS,
+    PERFORMANCE_REVIEWS_LIMIT,
+)
+import asyncio
+import heapq
+import itertools
 import json
+import re
+import threading
+import time
 
 
 import os
 
 load_dotenv()
 
+# langchain and the Gemini client are heavy to import, so they are loaded on
+# first use (or by warm_up() from the app lifespan) rather than at import time.
+if TYPE_CHECKING:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+
+LLM_MODEL = "gemini-2.0-flash"
+
+# Part of the result cache and request coalescing keys: bump a method's version
+# whenever its prompt changes, so replies produced by the old prompt are not reused.
+PROMPT_VERSIONS = {
+    "analyze_employee_data": 2,
+    "plan_intervention": 2,
+    "generate_initial_message": 1,
+    "summarize_history": 1,
+    "analyze_chats": 1,
+    "ask_followup_question": 1,
+    "generate_session_summary": 1,
+}
+
+FOLLOWUP_PROMPT = """You are Emolyzer, an expert at workplace conversations. Analyze this:
+
+Employee: {employee_name}
+Context: {context}
+
+Respond in this exact JSON format ONLY (no other text, no code formatting):
+
+{{
+    "continue_followup": boolean,
+    "response": string,
+    "reason": string
+}}
+
+STRICT RULES:
+1. "continue_followup": True ONLY IF:
+   - The response was incomplete or unclear
+   - You need exactly ONE more piece of information
+   - This would be the FIRST follow-up for this topic
+   - The employee seems willing to continue
+
+2. NEVER set "continue_followup": True if:
+   - This would be the 3rd follow-up on the same topic
+   - The response was clear and complete
+   - The employee seems disengaged or brief
+
+3. "response" should be:
+   - A single, concise follow-up question when continuing
+   - A natural transition or closing statement when stopping
+
+4. "reason" must explain your decision in 5-10 words
+
+Example valid responses:
+{{ "continue_followup": true, "response": "Could you clarify what you meant by that?", "reason": "Response needs clarification" }}
+{{ "continue_followup": false, "response": "Thank you, that's helpful to know.", "reason": "Topic fully explored" }}
+{{ "continue_followup": false, "response": "Let's move to another aspect of this.", "reason": "Maximum follow-ups reached" }}"""
+
+_CONTINUE_FOLLOWUP = re.compile(r'"continue_followup"\s*:\s*(true|false)')
+
+
+def _followup_context(current_response: Optional[str], conversation_history: Optional[str]) -> str:
+    context_parts = []
+    if current_response:
+        context_parts.append(f"Current response: {current_response}")
+    if conversation_history:
+        context_parts.append(f"Conversation history:\n{conversation_history}")
+    return "\n\n".join(context_parts) if context_parts else "No specific context"
+
+
+def _extract_json(content: str) -> dict:
+    """Parse the JSON object in raw model output, tolerating code fences and text around it"""
+    json_str = content.strip()
+
+    # Remove any code formatting markers
+    json_str = json_str.replace('```json', '').replace('```', '').strip()
+
+    # Handle cases where LLM adds explanations before/after JSON
+    if '{' in json_str and '}' in json_str:
+        json_str = json_str[json_str.find('{'):json_str.rfind('}')+1]
+
+    return json.loads(json_str)
+
+
+def _parse_followup(content: str) -> dict:
+    """Extract and validate the follow-up decision JSON from raw model output"""
+    response = _extract_json(content)
+    
+    # Validate response structure
+    if not all(key in response for key in ["continue_followup", "response", "reason"]):
+        raise ValueError("Missing required fields in LLM response")
+        
+    if not isinstance(response["continue_followup"], bool):
+        raise ValueError("continue_followup must be boolean")
+        
+    return {
+        "continue_followup": response["continue_followup"],
+        "response": str(response["response"]),
+        "reason": str(response["reason"])
+    }
+
+
+def _parse_chat_analysis(content: str) -> dict:
+    """Extract and validate the analyze_chats JSON from raw model output"""
+    response = _extract_json(content)
+    
+    # Validate response structure
+    required_keys = [
+        "summary",
+        "identified_reason",
+        "vulnerability_score",
+        "escalation_required"
+    ]
+    if not all(key in response for key in required_keys):
+        raise ValueError("Missing required fields in LLM response")
+        
+    # Validate nested structures
+    if not all(k in response["identified_reason"] for k in ["reason", "confidence", "supporting_phrases"]):
+        raise ValueError("Invalid identified_reason structure")
+        
+    if not all(k in response["vulnerability_score"] for k in ["value", "rationale"]):
+        raise ValueError("Invalid vulnerability_score structure")
+        
+    if not isinstance(response["escalation_required"], bool):
+        raise ValueError("escalation_required must be boolean")
+
+    return response
+
+
+class _JsonStringStreamer:
+    """Incrementally decodes one string value out of a JSON document that is still being generated"""
+
+    def __init__(self, key: str):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(key))
+        self._pos = None
+        self.done = False
+        self.text = ""
+
+    def feed(self, buffer: str) -> str:
+        """Return the part of the value that became available since the last call"""
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._start.search(buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        pieces = []
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char == '\\':
+                # Wait for the rest of an escape sequence split across chunks
+                length = 6 if buffer[i + 1:i + 2] == 'u' else 2
+                if i + length > len(buffer):
+                    break
+                sequence = buffer[i:i + length]
+                try:
+                    pieces.append(json.loads(f'"{sequence}"'))
+                except json.JSONDecodeError:
+                    pieces.append(sequence)
+                i += length
+                continue
+            pieces.append(char)
+            i += 1
+
+        self._pos = i
+        piece = "".join(pieces)
+        self.text += piece
+        return piece
+
+
+EMPLOYEE_DATA_PROMPT = """
+            Each data set is CSV with a header row, newest first.
+
+            Vibe Meter Data (last {vibe_limit} entries):
+            {vibe_meter_data}
+
+            Rewards Data (last {awards_days} days):
+            {rewards_data}
+
+            Leave Data (last {leaves_days} days):
+            {leave_data}
+
+            Performance Data (last {reviews_limit} reviews):
+            {performance_data}
+
+            Trend Features (slopes are per day; z is standard deviations from the employee's own baseline;
+            vibe values are the scale, negative for a negative mood):
+            {trend_features}
+
+            {format_instructions}
+            """
+
+
+def _employee_data_inputs(prompt: str,
+                          vibe_meter_data: List[Dict],
+                          rewards_data: List[Dict],
+                          leave_data: List[Dict],
+                          performance_data: List[Dict],
+                          features: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Template variables for EMPLOYEE_DATA_PROMPT"""
+    data = format_prompt_data(prompt, {
+        "vibemeter": vibe_meter_data,
+        "awards": rewards_data,
+        "leaves": leave_data,
+        "performance_reviews": performance_data
+    })
+    return {
+        "vibe_meter_data": data["vibemeter"],
+        "rewards_data": data["awards"],
+        "leave_data": data["leaves"],
+        "performance_data": data["performance_reviews"],
+        "trend_features": format_features(features),
+        "vibe_limit": VIBE_HISTORY_LIMIT,
+        "awards_days": AWARDS_WINDOW_DAYS,
+        "leaves_days": LEAVES_WINDOW_DAYS,
+        "reviews_limit": PERFORMANCE_REVIEWS_LIMIT,
+    }
+
+
+def _method_limits(spec: str, cast: Callable[[str], Any] = int) -> Dict[str, Any]:
+    """Parse "method=value,method=value" settings"""
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item:
+            method, value = item.split("=", 1)
+            limits[method.strip()] = cast(value)
+    return limits
+
+
+# Gemini traffic control. Every call is admitted in priority order once a
+# global concurrency slot and a rate-limit token are both free; some methods
+# additionally have their own concurrency cap. Identical requests already in
+# flight share one call.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_METHOD_CONCURRENCY = _method_limits(os.getenv(
+    "LLM_METHOD_CONCURRENCY", "analyze_chats=2,summarize_history=2,generate_session_summary=2"
+))
+# Requests per minute allowed by our quota (0 disables the limiter), and how many may go out back to back
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "60"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+
+# Lower runs first: live chat turns, then vibemeter submissions, then background work
+LLM_PRIORITIES = {
+    "ask_followup_question": 0,
+    "stream_followup_question": 0,
+    "plan_intervention": 1,
+    "analyze_employee_data": 1,
+    "generate_initial_message": 1,
+    "summarize_history": 2,
+    "analyze_chats": 2,
+    "generate_session_summary": 2,
+}
+# Bulk work such as the nightly batch scoring passes this to yield to everything above
+LLM_BATCH_PRIORITY = 3
+
+
+class LLMGateway:
+    """Priority admission, token-bucket rate limiting and singleflight for LLM calls"""
+
+    def __init__(self,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 rate_per_minute: float = LLM_RATE_LIMIT_RPM,
+                 burst: int = LLM_RATE_BURST):
+        self.max_concurrency = max_concurrency
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._running = 0
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._method_slots: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _method_stats(self, method: str) -> Dict[str, int]:
+        return self._stats.setdefault(method, {"calls": 0, "coalesced": 0, "waiting": 0, "running": 0, "timed_out": 0})
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _dispatch(self) -> None:
+        """Admit waiters, highest priority first, while a slot and a token are free"""
+        self._timer = None
+        while self._waiters and self._running < self.max_concurrency:
+            if self.rate > 0:
+                self._refill()
+                if self._tokens < 1:
+                    delay = (1 - self._tokens) / self.rate
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                    return
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            if self.rate > 0:
+                self._tokens -= 1
+            self._running += 1
+            future.set_result(None)
+
+    async def _admit(self, priority: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._timer is None:
+            self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled: hand the slot back
+                self.release()
+            raise
+
+    def try_acquire(self) -> bool:
+        """Take a concurrency slot and a rate-limit token without queueing, for optional
+        extra calls such as hedges. Fails when either is short or anything is waiting;
+        pair a successful call with release()."""
+        if self._waiters or self._running >= self.max_concurrency:
+            return False
+        if self.rate > 0:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+        self._running += 1
+        return True
+
+    def release(self) -> None:
+        self._running -= 1
+        if self._timer is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, method: str, priority: Optional[int] = None, deadline: Optional[float] = None):
+        """Hold an admission slot for one call (used directly by streaming calls).
+
+        `priority` overrides the method's entry in LLM_PRIORITIES. Waiting for
+        admission past `deadline` (event loop time) raises TimeoutError.
+        """
+        stats = self._method_stats(method)
+        limit = LLM_METHOD_CONCURRENCY.get(method)
+        method_slot = None
+        if limit:
+            method_slot = self._method_slots.setdefault(method, asyncio.Semaphore(limit))
+
+        stats["waiting"] += 1
+        try:
+            async with asyncio.timeout_at(deadline):
+                if method_slot is not None:
+                    await method_slot.acquire()
+                try:
+                    await self._admit(LLM_PRIORITIES.get(method, 1) if priority is None else priority)
+                except BaseException:
+                    if method_slot is not None:
+                        method_slot.release()
+                    raise
+        except TimeoutError:
+            stats["timed_out"] += 1
+            raise
+        finally:
+            stats["waiting"] -= 1
+
+        stats["calls"] += 1
+        stats["running"] += 1
+        try:
+            yield
+        finally:
+            stats["running"] -= 1
+            self.release()
+            if method_slot is not None:
+                method_slot.release()
+
+    async def run(self, method: str, key: Optional[str], call: Callable[[], Awaitable[Any]],
+                  priority: Optional[int] = None, deadline: Optional[float] = None) -> Any:
+        """Run `call` under the method's limits; concurrent calls with the same key share one result.
+
+        No caller waits past its own `deadline` (event loop time), queueing included.
+        """
+        if key is not None:
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self._method_stats(method)["coalesced"] += 1
+                async with asyncio.timeout_at(deadline):
+                    return await asyncio.shield(pending)
+
+        async def execute():
+            async with self.slot(method, priority, deadline):
+                return await call()
+
+        task = asyncio.ensure_future(execute())
+        # Consume the outcome even when every caller has already given up on it
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        if key is not None:
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller giving up doesn't cancel the call for the others
+        async with asyncio.timeout_at(deadline):
+            return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        if self.rate > 0:
+            self._refill()
+        return {
+            "running": self._running,
+            "waiting": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "rate_limit_rpm": self.rate * 60,
+            "tokens_available": round(self._tokens, 2) if self.rate > 0 else None,
+            "methods": self._stats,
+        }
+
+
+# Latency budgets and failure handling. Each call has a hard budget that covers
+# its wait for gateway admission as well as the model call (the whole stream,
+# for streaming calls). Calls to
+# LLM_HEDGE_METHODS that are still running after the method's observed p95
+# latency get a second, hedged request (to LLM_HEDGE_MODEL if set) and the
+# first reply wins. After LLM_BREAKER_THRESHOLD consecutive failures the
+# breaker opens and calls fail fast for LLM_BREAKER_COOLDOWN seconds, so the
+# callers' fallback responses are served immediately.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_TIMEOUTS = _method_limits(os.getenv(
+    "LLM_TIMEOUTS",
+    "ask_followup_question=10,stream_followup_question=15,generate_initial_message=15,"
+    "analyze_employee_data=20,plan_intervention=25"
+), float)
+LLM_HEDGE_METHODS = {
+    method.strip() for method in
+    os.getenv("LLM_HEDGE_METHODS", "ask_followup_question,generate_initial_message").split(",")
+    if method.strip()
+}
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL") or LLM_MODEL
+# Hedge delay used until a method has enough latency samples for a p95
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "3"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+
+class LLMUnavailableError(Exception):
+    """Raised instead of calling the model while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `cooldown` seconds lets one trial call through"""
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.trips = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self._trial or time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if not self._trial and time.monotonic() - self._opened_at >= self.cooldown:
+            self._trial = True
+            return True
+        return False
+
+    def retry_in(self) -> float:
+        """Seconds until the cooldown ends and a trial call may go through (0 when closed)"""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self._trial or (self._opened_at is None and self.failures >= self.threshold):
+            self._opened_at = time.monotonic()
+            self._trial = False
+            self.trips += 1
+
+    def abandoned(self) -> None:
+        """A call was cancelled before it finished. Only a half-open trial counts this
+        as a failure (so the breaker re-opens and retries after the cooldown); an
+        ordinary call says nothing about the model's health."""
+        if self._trial:
+            self.failure()
+
+
+class _LatencyTracker:
+    """Recent successful call latencies per method"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, method: str, seconds: float) -> None:
+        self._samples.setdefault(method, deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, method: str) -> Optional[float]:
+        samples = self._samples.get(method)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
 class LLMService:
     def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(
+        self._llm = None
+        self._hedge_llm = None
+        self._lock = threading.Lock()
+        self.gateway = LLMGateway()
+        self.breaker = CircuitBreaker()
+        self.latency = _LatencyTracker()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    @staticmethod
+    def _build_llm(model: str) -> "ChatGoogleGenerativeAI":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(
             temperature=0.2,
-            model="gemini-2.0-flash",
+            model=model,
             api_key=os.getenv("GOOGLE_API_KEY")
         )
 
+    @property
+    def llm(self) -> "ChatGoogleGenerativeAI":
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = self._build_llm(LLM_MODEL)
+        return self._llm
+
+    @property
+    def hedge_llm(self) -> "ChatGoogleGenerativeAI":
+        if LLM_HEDGE_MODEL == LLM_MODEL:
+            return self.llm
+        if self._hedge_llm is None:
+            with self._lock:
+                if self._hedge_llm is None:
+                    self._hedge_llm = self._build_llm(LLM_HEDGE_MODEL)
+        return self._hedge_llm
+
+    @staticmethod
+    def deadline(method: str) -> float:
+        """Event loop time by which a call to `method` started now must finish"""
+        return asyncio.get_running_loop().time() + LLM_TIMEOUTS.get(method, LLM_TIMEOUT)
+
+    def _remaining(self, method: str, deadline: float) -> float:
+        """Budget left for the model call; the time already spent queueing is not the model's fault,
+        so running out here raises TimeoutError without involving the breaker"""
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            self.timeouts += 1
+            raise TimeoutError(f"{method} spent its latency budget waiting for admission")
+        return remaining
+
+    async def _call(self, method: str, prompt, inputs: Dict[str, Any], deadline: float) -> Any:
+        """One model call within what is left of the budget, hedged if configured, tracked by the breaker"""
+        remaining = self._remaining(method, deadline)
+        if not self.breaker.allow():
+            raise LLMUnavailableError(f"LLM circuit breaker is open, not calling {method}")
+
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._hedged(method, prompt, inputs), remaining)
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                self.timeouts += 1
+            self.breaker.failure()
+            raise
+        except BaseException:
+            self.breaker.abandoned()
+            raise
+
+        self.breaker.success()
+        self.latency.record(method, time.monotonic() - started)
+        return result
+
+    async def _stream(self, method: str, prompt, inputs: Dict[str, Any], deadline: float) -> AsyncIterator[Any]:
+        """Stream a model reply that must be complete by `deadline`, tracked by the breaker"""
+        self._remaining(method, deadline)
+        if not self.breaker.allow():
+            raise LLMUnavailableError(f"LLM circuit breaker is open, not calling {method}")
+
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        chunks = (prompt | self.llm).astream(inputs).__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except GeneratorExit:
+            # The caller stopped reading early; the model was answering fine
+            self.breaker.success()
+            raise
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                self.timeouts += 1
+            self.breaker.failure()
+            raise
+        except BaseException:
+            # Cancelled, e.g. the SSE / WebSocket client went away mid-stream
+            self.breaker.abandoned()
+            raise
+        else:
+            self.breaker.success()
+            self.latency.record(method, time.monotonic() - started)
+        finally:
+            await chunks.aclose()
+
+    async def _hedged(self, method: str, prompt, inputs: Dict[str, Any]) -> Any:
+        if method not in LLM_HEDGE_METHODS:
+            return await (prompt | self.llm).ainvoke(inputs)
+
+        primary = asyncio.ensure_future((prompt | self.llm).ainvoke(inputs))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.latency.p95(method) or LLM_HEDGE_DELAY)
+            if done or not self.gateway.try_acquire():
+                return await primary
+
+            self.hedges += 1
+            hedge = asyncio.ensure_future((prompt | self.hedge_llm).ainvoke(inputs))
+            # The hedge holds its own gateway slot until it has actually finished or been cancelled
+            hedge.add_done_callback(lambda _: self.gateway.release())
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Both attempts failed: surface the primary's error
+            return primary.result()
+        finally:
+            # Also reached when the caller is cancelled (deadline, client gone) while waiting,
+            # so no Gemini request outlives the gateway slot it was started under
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.gateway.stats(),
+            "breaker": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.failures,
+                "trips": self.breaker.trips,
+            },
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_seconds": {method: self.latency.p95(method) for method in LLM_PRIORITIES},
+        }
+
+    async def _invoke(self, method: str, prompt, inputs: Dict[str, Any], parse: Callable[[str], Any] = lambda content: content,
+                      priority: Optional[int] = None) -> Any:
+        """Run `prompt | llm` through the gateway (with timeout, hedging and circuit breaker)
+        and parse the reply, answering from the result cache when the method is cached.
+
+        Only replies that parse are stored, so a malformed answer is never replayed.
+        """
+        deadline = self.deadline(method)
+        key = llm_result_cache.key(method, PROMPT_VERSIONS[method], LLM_MODEL, inputs)
+        cached = llm_result_cache.enabled(method)
+        if cached:
+            content = await llm_result_cache.get(method, key)
+            if content is not None:
+                return parse(content)
+
+        result = await self.gateway.run(
+            method, key, lambda: self._call(method, prompt, inputs, deadline), priority, deadline
+        )
+        parsed = parse(result.content)
+        if cached:
+            await llm_result_cache.set(key, result.content)
+        return parsed
+
+    def warm_up(self) -> None:
+        """Import langchain and build the Gemini client ahead of the first request"""
+        try:
+            import langchain.prompts
+            import langchain.output_parsers
+            self.llm
+        except Exception as e:
+            print(f"LLM warm-up failed, will retry on first use: {str(e)}")
+
     async def analyze_employee_data(self,
                                      vibe_meter_data: List[Dict],
                                      rewards_data: List[Dict],
                                      leave_data: List[Dict],
-                                     performance_data: List[Dict]) -> InterventionDecision:
+                                     performance_data: List[Dict],
+                                     features: Optional[Dict[str, Any]] = None,
+                                     priority: Optional[int] = None) -> InterventionDecision:
         """Analyze employee data to determine if intervention is needed"""
+        from langchain.prompts import ChatPromptTemplate
+        from langchain.output_parsers import PydanticOutputParser
         parser = PydanticOutputParser(pydantic_object=InterventionDecision)
 
         prompt = ChatPromptTemplate.from_messages([
@@ -33,33 +751,51 @@ class LLMService:
             Consider recent mood trends, rewards history, leave patterns, and performance.
             If there's a concerning pattern, especially in recent mood data, recommend intervention.
             Format your response according to the specified output format."""),
-            ("human", """
-            Vibe Meter Data (last 10 days): {vibe_meter_data}
-            Rewards Data (last 1 year): {rewards_data}
-            Leave Data (last 2 months): {leave_data}
-            Performance Data (last review): {performance_data}
-
-            {format_instructions}
-            """)
+            ("human", EMPLOYEE_DATA_PROMPT)
         ])
 
-        chain = prompt | self.llm | parser
-
-        result = await chain.ainvoke({
-            "vibe_meter_data": vibe_meter_data,
-            "rewards_data": rewards_data,
-            "leave_data": leave_data,
-            "performance_data": performance_data,
+        return await self._invoke("analyze_employee_data", prompt, {
+            **_employee_data_inputs("analyze_employee_data", vibe_meter_data, rewards_data, leave_data, performance_data, features),
             "format_instructions": parser.get_format_instructions()
-        })
+        }, parser.parse, priority)
 
-        return result
+    async def plan_intervention(self,
+                                employee_name: str,
+                                vibe_meter_data: List[Dict],
+                                rewards_data: List[Dict],
+                                leave_data: List[Dict],
+                                performance_data: List[Dict],
+                                features: Optional[Dict[str, Any]] = None) -> InterventionPlan:
+        """analyze_employee_data and generate_initial_message in a single round trip"""
+        from langchain.prompts import ChatPromptTemplate
+        from langchain.output_parsers import PydanticOutputParser
+        parser = PydanticOutputParser(pydantic_object=InterventionPlan)
+
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", """You are Emolyzer, an AI specialized in employee wellbeing analysis.
+            Analyze the provided data about an employee and determine if an intervention is needed.
+            Consider recent mood trends, rewards history, leave patterns, and performance.
+            If there's a concerning pattern, especially in recent mood data, recommend intervention.
+            When an intervention is needed, also write the opening message for a supportive conversation
+            with the employee (addressed as {employee_name}): warm, empathetic and non-judgmental, not too
+            direct about the data you've seen, gently inviting them to share their feelings, 2-3 short
+            paragraphs at most.
+            Format your response according to the specified output format."""),
+            ("human", EMPLOYEE_DATA_PROMPT)
+        ])
+
+        return await self._invoke("plan_intervention", prompt, {
+            **_employee_data_inputs("plan_intervention", vibe_meter_data, rewards_data, leave_data, performance_data, features),
+            "employee_name": employee_name,
+            "format_instructions": parser.get_format_instructions()
+        }, parser.parse)
 
     async def generate_initial_message(self,
                                          employee_name: str,
                                          vibe_meter_data: List[Dict],
                                          probable_reasons: List[str]) -> str:
         """Generate an initial conversation message based on employee data"""
+        from langchain.prompts import ChatPromptTemplate
         prompt = ChatPromptTemplate.from_messages([
             ("system", """You are Emolyzer, an empathetic AI assistant focused on employee wellbeing.
             Your goal is to start a supportive conversation with an employee who may be experiencing challenges.
@@ -68,22 +804,29 @@ class LLMService:
             Keep your message relatively short (2-3 paragraphs maximum)."""),
             ("human", """
             Employee Name: {employee_name}
-            Recent Mood Data: {vibe_meter_data}
+            Recent Mood Data (CSV, newest first):
+            {vibe_meter_data}
             Potential Concerns: {probable_reasons}
 
             Generate a warm, empathetic opening message to start a conversation with this employee.
             """)
         ])
 
-        chain = prompt | self.llm
+        data = format_prompt_data("generate_initial_message", {"vibemeter": vibe_meter_data})
 
-        result = await chain.ainvoke({
-            "employee_name": employee_name,
-            "vibe_meter_data": vibe_meter_data,
-            "probable_reasons": probable_reasons
-        })
-
-        return result.content
+        try:
+            return await self._invoke("generate_initial_message", prompt, {
+                "employee_name": employee_name,
+                "vibe_meter_data": data["vibemeter"],
+                "probable_reasons": probable_reasons
+            })
+        except Exception as e:
+            print(f"LLM processing error: {str(e)}")
+            return (
+                "Hi, thank you for sharing how you've been feeling lately. "
+                "I'd like to check in and hear a little more about how things are going for you. "
+                "Whenever you're ready, tell me what's been on your mind."
+            )
     
     async def ask_followup_question(
         self,
@@ -92,87 +835,19 @@ class LLMService:
         conversation_history: Optional[str] = None
     ) -> dict:
         """Determine whether to continue follow-up and generate appropriate response"""
-        # Build context string
-        context_parts = []
-        if current_response:
-            context_parts.append(f"Current response: {current_response}")
-        if conversation_history:
-            context_parts.append(f"Conversation history:\n{conversation_history}")
-        context = "\n\n".join(context_parts) if context_parts else "No specific context"
-
-        prompt_template = """You are Emolyzer, an expert at workplace conversations. Analyze this:
-
-Employee: {employee_name}
-Context: {context}
-
-Respond in this exact JSON format ONLY (no other text, no code formatting):
-
-{{
-    "continue_followup": boolean,
-    "response": string,
-    "reason": string
-}}
-
-STRICT RULES:
-1. "continue_followup": True ONLY IF:
-   - The response was incomplete or unclear
-   - You need exactly ONE more piece of information
-   - This would be the FIRST follow-up for this topic
-   - The employee seems willing to continue
-
-2. NEVER set "continue_followup": True if:
-   - This would be the 3rd follow-up on the same topic
-   - The response was clear and complete
-   - The employee seems disengaged or brief
-
-3. "response" should be:
-   - A single, concise follow-up question when continuing
-   - A natural transition or closing statement when stopping
-
-4. "reason" must explain your decision in 5-10 words
-
-Example valid responses:
-{{ "continue_followup": true, "response": "Could you clarify what you meant by that?", "reason": "Response needs clarification" }}
-{{ "continue_followup": false, "response": "Thank you, that's helpful to know.", "reason": "Topic fully explored" }}
-{{ "continue_followup": false, "response": "Let's move to another aspect of this.", "reason": "Maximum follow-ups reached" }}"""
+        from langchain.prompts import ChatPromptTemplate
+        context = _followup_context(current_response, conversation_history)
 
         try:
-            prompt = ChatPromptTemplate.from_template(prompt_template)
-            chain = prompt | self.llm
-            
-            result = await chain.ainvoke({
+            prompt = ChatPromptTemplate.from_template(FOLLOWUP_PROMPT)
+
+            return await self._invoke("ask_followup_question", prompt, {
                 "employee_name": employee_name,
                 "context": context
-            })
-
-            # Robust JSON extraction
-            json_str = result.content.strip()
-            
-            # Remove any code formatting markers
-            json_str = json_str.replace('```json', '').replace('```', '').strip()
-            
-            # Handle cases where LLM adds explanations before/after JSON
-            if '{' in json_str and '}' in json_str:
-                json_str = json_str[json_str.find('{'):json_str.rfind('}')+1]
-            
-            # Parse with validation
-            response = json.loads(json_str)
-            
-            # Validate response structure
-            if not all(key in response for key in ["continue_followup", "response", "reason"]):
-                raise ValueError("Missing required fields in LLM response")
-                
-            if not isinstance(response["continue_followup"], bool):
-                raise ValueError("continue_followup must be boolean")
-                
-            return {
-                "continue_followup": response["continue_followup"],
-                "response": str(response["response"]),
-                "reason": str(response["reason"])
-            }
+            }, _parse_followup)
             
         except json.JSONDecodeError as e:
-            print(f"Failed to parse LLM response: {json_str}. Error: {str(e)}")
+            print(f"Failed to parse LLM response: {e.doc}. Error: {str(e)}")
             return {
                 "continue_followup": False,
                 "response": "Let's move on to another topic.",
@@ -186,23 +861,120 @@ Example valid responses:
                 "reason": "System processing error"
             }
 
+    async def stream_followup_question(
+        self,
+        employee_name: str,
+        current_response: Optional[str] = None,
+        conversation_history: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of ask_followup_question.
+
+        Yields {"type": "decision", "continue_followup": bool} as soon as the flag
+        is generated, then {"type": "token", "text": str} for each new piece of the
+        "response" value when continuing, and finally {"type": "result", ...} with
+        the same fields ask_followup_question returns. When the model decides not to
+        continue, generation stops right after the flag: the caller supplies the
+        next question itself. Errors before any reply text fall back like
+        ask_followup_question; errors after it are raised.
+        """
+        from langchain.prompts import ChatPromptTemplate
+        context = _followup_context(current_response, conversation_history)
+        buffer = ""
+        decision = None
+        streamer = _JsonStringStreamer("response")
+
+        try:
+            prompt = ChatPromptTemplate.from_template(FOLLOWUP_PROMPT)
+
+            deadline = self.deadline("stream_followup_question")
+            async with self.gateway.slot("stream_followup_question", deadline=deadline), \
+                    aclosing(self._stream("stream_followup_question", prompt, {
+                        "employee_name": employee_name,
+                        "context": context
+                    }, deadline)) as chunks:
+                async for chunk in chunks:
+                    buffer += chunk.content
+                    if decision is None:
+                        match = _CONTINUE_FOLLOWUP.search(buffer)
+                        if not match:
+                            continue
+                        decision = match.group(1) == "true"
+                        yield {"type": "decision", "continue_followup": decision}
+                        if not decision:
+                            break
+                    text = streamer.feed(buffer)
+                    if text:
+                        yield {"type": "token", "text": text}
+
+            if decision is False:
+                yield {"type": "result", "continue_followup": False, "response": "", "reason": "Topic fully explored"}
+                return
+
+            try:
+                result = _parse_followup(buffer)
+            except (json.JSONDecodeError, ValueError) as e:
+                if not streamer.text:
+                    raise
+                # The visible text was already streamed; keep it even if the tail is malformed
+                print(f"Failed to parse streamed LLM response: {buffer}. Error: {str(e)}")
+                result = {"continue_followup": True, "response": streamer.text, "reason": "Response needs clarification"}
+            yield {"type": "result", **result}
+
+        except Exception as e:
+            print(f"LLM processing error: {str(e)}")
+            if streamer.text:
+                # Part of the reply is already on screen; a substitute would contradict it
+                raise
+            yield {
+                "type": "result",
+                "continue_followup": False,
+                "response": "I appreciate your input. Let's continue.",
+                "reason": "System processing error"
+            }
+
+    async def summarize_history(self, previous_summary: Optional[str], messages: List[str]) -> str:
+        """Fold older conversation messages into the running summary used in place of them"""
+        from langchain.prompts import ChatPromptTemplate
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", """You maintain a running summary of a wellbeing conversation between an employee and an AI assistant.
+            Extend the existing summary with the new messages. Keep the employee's key statements,
+            feelings and any concerns they raised (quote short phrases where they matter), and which
+            topics have already been covered. Write plain prose, under 200 words."""),
+            ("human", """
+            Existing summary: {previous_summary}
+
+            New messages:
+            {messages}
+            """)
+        ])
+
+        content = await self._invoke("summarize_history", prompt, {
+            "previous_summary": previous_summary or "None yet",
+            "messages": "\n".join(messages)
+        })
+
+        return content.strip()
+
     async def analyze_chats(
         self,
         intervention_reasons: List[str],
         chat_history: str,
-        employee_name: str
+        employee_name: str,
+        strict: bool = False
     ) -> dict:
         """
         Analyze conversation history to determine mental health status and intervention needs.
         
         Args:
             intervention_reasons: List of possible intervention reasons
-            chat_history: Full conversation history as text
+            chat_history: Conversation history as text (a running summary plus the recent messages for long chats)
             employee_name: Name of the employee being analyzed
+            strict: Raise on LLM or parsing errors instead of returning the default analysis
             
         Returns:
             Dictionary containing analysis results in the specified format
         """
+        from langchain.prompts import ChatPromptTemplate
         prompt_template = """
         You are a mental health support assistant. Your job is to analyze the mental health of an employee based on conversation history of a employee, given a set of possible intervention reasons. 
         The conversation history is aimed to know the reason behind the employee's mental health.
@@ -274,51 +1046,17 @@ Example valid responses:
 
         try:
             prompt = ChatPromptTemplate.from_template(prompt_template)
-            chain = prompt | self.llm
-            
-            result = await chain.ainvoke({
+
+            return await self._invoke("analyze_chats", prompt, {
                 "intervention_reasons": "\n".join(intervention_reasons),
                 "chat_history": chat_history,
                 "employee_name": employee_name
-            })
-
-            # Robust JSON extraction
-            json_str = result.content.strip()
-            
-            # Remove any code formatting markers
-            json_str = json_str.replace('```json', '').replace('```', '').strip()
-            
-            # Handle cases where LLM adds explanations before/after JSON
-            if '{' in json_str and '}' in json_str:
-                json_str = json_str[json_str.find('{'):json_str.rfind('}')+1]
-            
-            # Parse with validation
-            response = json.loads(json_str)
-            
-            # Validate response structure
-            required_keys = [
-                "summary",
-                "identified_reason",
-                "vulnerability_score",
-                "escalation_required"
-            ]
-            if not all(key in response for key in required_keys):
-                raise ValueError("Missing required fields in LLM response")
-                
-            # Validate nested structures
-            if not all(k in response["identified_reason"] for k in ["reason", "confidence", "supporting_phrases"]):
-                raise ValueError("Invalid identified_reason structure")
-                
-            if not all(k in response["vulnerability_score"] for k in ["value", "rationale"]):
-                raise ValueError("Invalid vulnerability_score structure")
-                
-            if not isinstance(response["escalation_required"], bool):
-                raise ValueError("escalation_required must be boolean")
-                
-            return response
+            }, _parse_chat_analysis)
             
         except json.JSONDecodeError as e:
-            print(f"Failed to parse LLM response: {json_str}. Error: {str(e)}")
+            print(f"Failed to parse LLM response: {e.doc}. Error: {str(e)}")
+            if strict:
+                raise
             return {
                 "summary": "Analysis failed due to system error",
                 "identified_reason": {
@@ -334,6 +1072,8 @@ Example valid responses:
             }
         except Exception as e:
             print(f"LLM processing error: {str(e)}")
+            if strict:
+                raise
             return {
                 "summary": "Analysis failed due to system error",
                 "identified_reason": {
@@ -351,6 +1091,7 @@ Example valid responses:
     async def generate_session_summary(self, conversation_history: List[Dict],
                                          identified_reason: str) -> str:
         """Generate a summary of the conversation for HR review"""
+        from langchain.prompts import ChatPromptTemplate
 
         # Format conversation history into a readable string
         formatted_history = "\n".join([
@@ -373,11 +1114,7 @@ Example valid responses:
             """)
         ])
 
-        chain = prompt | self.llm
-
-        result = await chain.ainvoke({
+        return await self._invoke("generate_session_summary", prompt, {
             "conversation_history": formatted_history,
             "identified_reason": identified_reason
         })
-
-        return result.content
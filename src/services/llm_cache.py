@@ -0,0 +1,164 @@
+from services.cache import TTLCache
+from dotenv import load_dotenv
+from typing import Any, Dict, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed cache for LLM results. Entries are keyed by a hash of the
+# method, its prompt version, the model and the (already normalized) prompt
+# inputs, so an identical request is answered without a Gemini call. Memory is
+# the first tier; LLM_CACHE_DIR enables a SQLite tier shared across restarts
+# and workers.
+LLM_CACHE_METHODS = {
+    method.strip() for method in
+    os.getenv("LLM_CACHE_METHODS", "analyze_employee_data,plan_intervention,analyze_chats").split(",")
+    if method.strip()
+}
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR")
+LLM_CACHE_DISK_MAX_MB = float(os.getenv("LLM_CACHE_DISK_MAX_MB", "100"))
+
+
+class _DiskTier:
+    """SQLite-backed tier with per-entry expiry and least-recently-used eviction by total size"""
+
+    def __init__(self, directory: str, max_bytes: int, ttl: int):
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "llm_cache.sqlite3"), check_same_thread=False)
+        self._db.execute("pragma journal_mode=wal")
+        self._db.execute("""
+            create table if not exists entries (
+                key text primary key,
+                value text not null,
+                size integer not null,
+                expires_at real not null,
+                accessed_at real not null
+            )
+        """)
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "select value from entries where key = ? and expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("update entries set accessed_at = ? where key = ?", (now, key))
+            self._db.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "insert or replace into entries (key, value, size, expires_at, accessed_at) values (?, ?, ?, ?, ?)",
+                (key, value, len(value), now + self.ttl, now)
+            )
+            self._db.execute("delete from entries where expires_at <= ?", (now,))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        total = self._db.execute("select coalesce(sum(size), 0) from entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("select key, size from entries order by accessed_at").fetchall():
+            self._db.execute("delete from entries where key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def size(self) -> int:
+        with self._lock:
+            return self._db.execute("select count(*) from entries").fetchone()[0]
+
+
+class LLMResultCache:
+    def __init__(self):
+        self.memory = TTLCache("llm_results", maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+        self.disk = _DiskTier(LLM_CACHE_DIR, int(LLM_CACHE_DISK_MAX_MB * 1024 * 1024), LLM_CACHE_TTL) \
+            if LLM_CACHE_DIR else None
+        self.disk_hits = 0
+        self.by_method: Dict[str, Dict[str, int]] = {}
+
+    def enabled(self, method: str) -> bool:
+        return method in LLM_CACHE_METHODS
+
+    @staticmethod
+    def key(method: str, version: int, model: str, inputs: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {"method": method, "version": version, "model": model, "inputs": inputs},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _count(self, method: str, outcome: str) -> None:
+        counts = self.by_method.setdefault(method, {"hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+    async def get(self, method: str, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                raw = await asyncio.to_thread(self.disk.get, key)
+            except Exception as e:
+                logger.error(f"LLM cache disk read failed: {str(e)}")
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.disk_hits += 1
+                self.memory.set(key, value)
+
+        self._count(method, "misses" if value is None else "hits")
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable result in every tier"""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, json.dumps(value, default=str))
+            except Exception as e:
+                logger.error(f"LLM cache disk write failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        methods = {
+            method: {
+                **counts,
+                "hit_rate": round(counts["hits"] / (counts["hits"] + counts["misses"]), 4)
+            }
+            for method, counts in self.by_method.items()
+        }
+        return {
+            "enabled_methods": sorted(LLM_CACHE_METHODS),
+            "memory": self.memory.stats(),
+            "disk": {
+                "entries": self.disk.size(),
+                "hits": self.disk_hits,
+                "evictions": self.disk.evictions,
+                "max_bytes": self.disk.max_bytes,
+            } if self.disk is not None else None,
+            "methods": methods,
+        }
+
+
+llm_result_cache = LLMResultCache()
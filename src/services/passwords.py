@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+from typing import Dict, Optional, Tuple
+import asyncio
+import os
+
+load_dotenv()
+
+# bcrypt cost factor. Hashes created with any other cost are transparently
+# rehashed on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a small thread pool runs verifications in parallel
+# without blocking the event loop. The semaphore caps how many run at once;
+# everything beyond that waits in the queue.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "4"))
+PASSWORD_MAX_CONCURRENCY = int(os.getenv("PASSWORD_MAX_CONCURRENCY", str(PASSWORD_WORKERS)))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_semaphore: Optional[asyncio.Semaphore] = None
+
+_stats = {
+    "waiting": 0,
+    "running": 0,
+    "peak_queue_depth": 0,
+    "verified": 0,
+    "rehashed": 0,
+}
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(PASSWORD_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password off the event loop.
+
+    Returns (valid, new_hash); new_hash is set when the stored hash should be
+    replaced because it was created with a different bcrypt cost.
+    """
+    _stats["waiting"] += 1
+    _stats["peak_queue_depth"] = max(_stats["peak_queue_depth"], _stats["waiting"] + _stats["running"])
+    acquired = False
+    try:
+        async with _get_semaphore():
+            acquired = True
+            _stats["waiting"] -= 1
+            _stats["running"] += 1
+            try:
+                loop = asyncio.get_running_loop()
+                valid, new_hash = await loop.run_in_executor(
+                    _executor, pwd_context.verify_and_update, plain_password, hashed_password
+                )
+            finally:
+                _stats["running"] -= 1
+    finally:
+        # A request cancelled while queued never reached the semaphore
+        if not acquired:
+            _stats["waiting"] -= 1
+
+    _stats["verified"] += 1
+    if new_hash:
+        _stats["rehashed"] += 1
+    return valid, new_hash
+
+
+def password_pool_stats() -> Dict[str, int]:
+    return {
+        **_stats,
+        "queue_depth": _stats["waiting"] + _stats["running"],
+        "workers": PASSWORD_WORKERS,
+        "max_concurrency": PASSWORD_MAX_CONCURRENCY,
+    }
+
+
+def shutdown_password_pool() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,86 @@
+from services.history import estimate_tokens
+from datetime import date, timedelta
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Tuple
+import csv
+import io
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# How much of each source the intervention analysis looks at. The queries are
+# bounded by these windows and the prompt labels are rendered from them.
+VIBE_HISTORY_LIMIT = int(os.getenv("PROMPT_VIBE_HISTORY_LIMIT", "10"))
+AWARDS_WINDOW_DAYS = int(os.getenv("PROMPT_AWARDS_WINDOW_DAYS", "365"))
+LEAVES_WINDOW_DAYS = int(os.getenv("PROMPT_LEAVES_WINDOW_DAYS", "60"))
+PERFORMANCE_REVIEWS_LIMIT = int(os.getenv("PROMPT_PERFORMANCE_REVIEWS_LIMIT", "1"))
+
+# Columns each data source contributes to a prompt, as (column, header). Ids,
+# emp_id and bookkeeping timestamps carry no signal for the model.
+PROMPT_FIELDS = {
+    "vibemeter": [("created_at", "date"), ("mood", "mood"), ("scale", "scale")],
+    "awards": [("award_date", "date"), ("award_type", "type"), ("reward_points", "points")],
+    "leaves": [("leave_start_date", "start"), ("leave_end_date", "end"), ("leave_type", "type"), ("leave_days", "days")],
+    "performance_reviews": [
+        ("review_period", "period"),
+        ("performance_rating", "rating"),
+        ("promotion_consideration", "promotion"),
+        ("manager_feedback", "feedback"),
+    ],
+}
+
+_DATE_COLUMNS = {"created_at", "award_date", "leave_start_date", "leave_end_date"}
+
+
+def prompt_columns(source: str) -> str:
+    """The select list for a source, so only the projected columns are fetched"""
+    return ", ".join(column for column, _ in PROMPT_FIELDS[source])
+
+
+def window_start(days: int) -> str:
+    """ISO date `days` ago, the lower bound for a windowed source"""
+    return (date.today() - timedelta(days=days)).isoformat()
+
+
+def _cell(column: str, value: Any) -> Any:
+    if value is None:
+        return ""
+    if column in _DATE_COLUMNS and isinstance(value, str):
+        # "2025-03-14T09:21:07.123456+00:00" -> "2025-03-14"
+        return value[:10]
+    if isinstance(value, bool):
+        return "y" if value else "n"
+    return value
+
+
+def format_records(source: str, rows: List[Dict[str, Any]]) -> str:
+    """Render rows as a compact CSV block (header line, one line per row), or "none" when empty"""
+    if not rows:
+        return "none"
+
+    fields = PROMPT_FIELDS[source]
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow([header for _, header in fields])
+    for row in rows:
+        writer.writerow([_cell(column, row.get(column)) for column, _ in fields])
+    return out.getvalue().rstrip("\n")
+
+
+def format_prompt_data(prompt: str, sources: Dict[str, List[Dict[str, Any]]]) -> Dict[str, str]:
+    """Serialize every source for `prompt`"""
+    formatted = {source: format_records(source, rows) for source, rows in sources.items()}
+    logger.debug(f"{prompt} prompt data: ~{sum(map(estimate_tokens, formatted.values()))} tokens")
+    return formatted
+
+
+def token_savings(sources: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Tuple[int, int]]:
+    """Estimated tokens per source as the repr of full, unprojected rows (what the
+    prompts used to embed) and as the compact block, for scripts/measure_prompt_data.py"""
+    return {
+        source: (estimate_tokens(str(rows)), estimate_tokens(format_records(source, rows)))
+        for source, rows in sources.items()
+    }
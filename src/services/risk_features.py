@@ -0,0 +1,237 @@
+from services.triage import TRIAGE_NEGATIVE_MOODS
+from datetime import date, datetime, time, timezone
+from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+import os
+
+load_dotenv()
+
+
+class _LazyNumpy:
+    """Stands in for the numpy module until first used, so importing this module
+    (and the API modules that use it) doesn't load NumPy at startup"""
+
+    def __getattr__(self, name: str) -> Any:
+        import numpy
+        globals()["np"] = numpy
+        return getattr(numpy, name)
+
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    np = _LazyNumpy()
+
+
+# Numeric trend features per employee, computed column-wise with NumPy so a
+# whole workforce is handled in a few array passes: rows of every employee are
+# flattened into (employee index, day, value) columns and reduced per employee
+# with bincount. Consumed by the triage, the HR dashboard and the intervention
+# prompts. Days are counted relative to `today`, so older rows have negative x.
+FEATURE_BASELINE_DAYS = int(os.getenv("FEATURE_BASELINE_DAYS", "60"))
+# Trailing window whose activity mean ("_recent") is compared against the
+# employee's baseline, i.e. the rest of the FEATURE_BASELINE_DAYS window
+FEATURE_RECENT_DAYS = int(os.getenv("FEATURE_RECENT_DAYS", "7"))
+
+ACTIVITY_METRICS = ("work_hours", "meetings_attended", "emails_sent")
+
+FEATURE_NAMES = [
+    "vibe_count",
+    "vibe_mean",
+    "vibe_slope",
+    "vibe_z",
+    *[
+        f"{metric}_{feature}"
+        for metric in ACTIVITY_METRICS
+        for feature in ("recent", "baseline", "slope", "z")
+    ],
+    "leave_days",
+    "award_points",
+    "days_since_award",
+]
+
+
+def _days(rows: List[Dict[str, Any]], column: str, today: date) -> "np.ndarray":
+    """Whole-day offsets from `today` of a date/timestamp column (ISO strings or dates)"""
+    dates = np.array([str(row[column])[:10] for row in rows], dtype="datetime64[D]")
+    return (dates - np.datetime64(today, "D")).astype(float)
+
+
+def _as_utc(value: Any) -> datetime:
+    moment = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _instants(rows: List[Dict[str, Any]], column: str, today: date) -> "np.ndarray":
+    """Fractional day offsets from the start of `today` (UTC) of a timestamp column, so same-day rows keep their order"""
+    origin = datetime.combine(today, time.min, tzinfo=timezone.utc).timestamp()
+    seconds = np.array([_as_utc(row[column]).timestamp() for row in rows], dtype=float)
+    return (seconds - origin) / 86400
+
+
+def _values(rows: List[Dict[str, Any]], column: str) -> "np.ndarray":
+    return np.array([row.get(column) for row in rows], dtype=float)
+
+
+def _divide(numerator: "np.ndarray", denominator: "np.ndarray", valid: "np.ndarray") -> "np.ndarray":
+    return np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan), where=valid)
+
+
+def _sums(idx: "np.ndarray", n: int, *columns: "np.ndarray") -> List["np.ndarray"]:
+    return [np.bincount(idx, weights=column, minlength=n) for column in columns]
+
+
+def _mean_std(count: "np.ndarray", total: "np.ndarray", squares: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """Per-group mean and sample standard deviation from count, sum and sum of squares"""
+    mean = _divide(total, count, count > 0)
+    variance = _divide(squares - count * np.nan_to_num(mean) ** 2, count - 1, count > 1)
+    return mean, np.sqrt(np.clip(variance, 0, None))
+
+
+def _slope(idx: "np.ndarray", n: int, x: "np.ndarray", y: "np.ndarray") -> "np.ndarray":
+    """Per-group least-squares slope of y over x (nan with fewer than two distinct days)"""
+    count = np.bincount(idx, minlength=n).astype(float)
+    sx, sy, sxx, sxy = _sums(idx, n, x, y, x * x, x * y)
+    denominator = count * sxx - sx ** 2
+    return _divide(count * sxy - sx * sy, denominator, denominator > 1e-9)
+
+
+def _z(value: "np.ndarray", mean: "np.ndarray", std: "np.ndarray") -> "np.ndarray":
+    return _divide(value - mean, std, std > 0)
+
+
+def _vibe_features(idx: "np.ndarray", n: int, x: "np.ndarray", y: "np.ndarray",
+                   at: "np.ndarray") -> Dict[str, "np.ndarray"]:
+    """Vibe count, mean and slope over days `x`, and the z-score of the latest
+    vibe (by full timestamp `at`) against that employee's earlier ones"""
+    count = np.bincount(idx, minlength=n).astype(float)
+    total, squares = _sums(idx, n, y, y * y)
+
+    latest = np.full(n, np.nan)
+    if len(idx):
+        order = np.lexsort((at, idx))
+        last = np.r_[np.nonzero(np.diff(idx[order]))[0], len(order) - 1]
+        latest[idx[order][last]] = y[order][last]
+    earlier = count - 1
+    base_mean, base_std = _mean_std(
+        earlier,
+        total - np.nan_to_num(latest),
+        squares - np.nan_to_num(latest) ** 2
+    )
+
+    return {
+        "vibe_count": count,
+        "vibe_mean": _divide(total, count, count > 0),
+        "vibe_slope": _slope(idx, n, x, y),
+        "vibe_z": _z(latest, base_mean, base_std),
+    }
+
+
+def _activity_features(idx: "np.ndarray", n: int, x: "np.ndarray", values: Dict[str, "np.ndarray"]) -> Dict[str, "np.ndarray"]:
+    """Per metric: the mean over the trailing FEATURE_RECENT_DAYS ("_recent"), the
+    mean of the days before it ("_baseline"), the slope over both, and the
+    recent mean as a z-score against the baseline"""
+    recent = x > -FEATURE_RECENT_DAYS
+    features = {}
+    for metric, y in values.items():
+        present = ~np.isnan(y)
+        m_idx, m_x, m_y, m_recent = idx[present], x[present], y[present], recent[present]
+
+        recent_count, recent_total = _sums(m_idx[m_recent], n, np.ones(m_recent.sum()), m_y[m_recent])
+        base_count, base_total, base_squares = _sums(
+            m_idx[~m_recent], n, np.ones((~m_recent).sum()), m_y[~m_recent], m_y[~m_recent] ** 2
+        )
+        recent_mean = _divide(recent_total, recent_count, recent_count > 0)
+        base_mean, base_std = _mean_std(base_count, base_total, base_squares)
+
+        features[f"{metric}_recent"] = recent_mean
+        features[f"{metric}_baseline"] = base_mean
+        features[f"{metric}_slope"] = _slope(m_idx, n, m_x, m_y)
+        features[f"{metric}_z"] = _z(recent_mean, base_mean, base_std)
+    return features
+
+
+def compute_features(sources: Dict[str, List[Dict[str, Any]]],
+                     emp_ids: Optional[Sequence[str]] = None,
+                     today: Optional[date] = None) -> Tuple[List[str], "np.ndarray"]:
+    """Feature matrix for many employees at once.
+
+    `sources` holds flat rows (each with `emp_id`) for "vibemeter", "activity",
+    "leaves" and "awards", already limited to the windows of interest. Returns
+    the employee ids and a (len(emp_ids), len(FEATURE_NAMES)) float array, nan
+    where a feature is undefined (e.g. no baseline to compare against).
+    """
+    # UTC, like the timestamps the day offsets are taken from
+    today = today or datetime.now(timezone.utc).date()
+    vibes = sources.get("vibemeter") or []
+    activity = sources.get("activity") or []
+    leaves = sources.get("leaves") or []
+    awards = sources.get("awards") or []
+
+    if emp_ids is None:
+        emp_ids = sorted({row["emp_id"] for rows in (vibes, activity, leaves, awards) for row in rows})
+    emp_ids = list(emp_ids)
+    n = len(emp_ids)
+    position = {emp_id: i for i, emp_id in enumerate(emp_ids)}
+
+    def index(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], "np.ndarray"]:
+        kept = [row for row in rows if row["emp_id"] in position]
+        return kept, np.array([position[row["emp_id"]] for row in kept], dtype=np.intp)
+
+    features: Dict[str, "np.ndarray"] = {}
+
+    # Vibes as a signed series: the scale counts against the employee for a negative mood.
+    # Several vibes can share a day, so the latest one is picked by full timestamp.
+    vibes, vibe_idx = index(vibes)
+    sign = np.array([-1.0 if str(row.get("mood", "")).lower() in TRIAGE_NEGATIVE_MOODS else 1.0 for row in vibes])
+    vibe_scale = np.nan_to_num(_values(vibes, "scale"), nan=1.0)
+    features.update(_vibe_features(
+        vibe_idx, n, _days(vibes, "created_at", today), sign * vibe_scale, _instants(vibes, "created_at", today)
+    ))
+
+    activity, activity_idx = index(activity)
+    features.update(_activity_features(
+        activity_idx, n, _days(activity, "date_msg", today),
+        {metric: _values(activity, metric) for metric in ACTIVITY_METRICS}
+    ))
+
+    leaves, leave_idx = index(leaves)
+    features["leave_days"], = _sums(leave_idx, n, np.nan_to_num(_values(leaves, "leave_days")))
+
+    awards, award_idx = index(awards)
+    features["award_points"], = _sums(award_idx, n, np.nan_to_num(_values(awards, "reward_points")))
+    last_award = np.full(n, -np.inf)
+    np.maximum.at(last_award, award_idx, _days(awards, "award_date", today))
+    features["days_since_award"] = np.where(np.isfinite(last_award), -last_award, np.nan)
+
+    return emp_ids, np.column_stack([features[name] for name in FEATURE_NAMES]) if n else np.empty((0, len(FEATURE_NAMES)))
+
+
+def features_by_employee(sources: Dict[str, List[Dict[str, Any]]],
+                         emp_ids: Optional[Sequence[str]] = None,
+                         today: Optional[date] = None) -> Dict[str, Dict[str, Optional[float]]]:
+    """compute_features as JSON-ready dicts keyed by emp_id (undefined features are None)"""
+    emp_ids, matrix = compute_features(sources, emp_ids, today)
+    rounded = np.round(matrix, 4)
+    return {
+        emp_id: {
+            name: None if np.isnan(value) else float(value)
+            for name, value in zip(FEATURE_NAMES, row)
+        }
+        for emp_id, row in zip(emp_ids, rounded)
+    }
+
+
+def employee_features(emp_id: str, sources: Dict[str, List[Dict[str, Any]]],
+                      today: Optional[date] = None) -> Dict[str, Optional[float]]:
+    """Features of one employee from that employee's rows (which need not carry `emp_id`)"""
+    tagged = {source: [{**row, "emp_id": emp_id} for row in rows] for source, rows in sources.items()}
+    return features_by_employee(tagged, [emp_id], today)[emp_id]
+
+
+def format_features(features: Optional[Dict[str, Optional[float]]]) -> str:
+    """Compact "name=value" lines for a prompt, skipping undefined features"""
+    if not features:
+        return "none"
+    lines = [f"{name}={value:g}" for name, value in features.items() if value is not None]
+    return "\n".join(lines) or "none"
@@ -0,0 +1,51 @@
+from services.supabase import supabase
+from datetime import date, datetime
+from typing import Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Incremental maintenance of the HR analytics rollup tables (sql/004_analytics_rollups.sql).
+# Each helper bumps a counter through an upsert RPC, so concurrent writers never
+# lose increments. Rollups are derived data: a failed bump is logged rather than
+# failing the request, and scripts/rebuild_rollups.py restores exact counts.
+
+
+def _day(value: Union[str, date, datetime]) -> str:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+async def _bump(function: str, params: dict) -> None:
+    try:
+        await supabase.rpc(function, params).execute()
+    except Exception as e:
+        logger.error(f"Rollup update {function} failed: {str(e)}")
+
+
+async def record_vibe(created_at: Union[str, datetime], mood: str) -> None:
+    """Count one vibemeter entry in the per-day mood histogram"""
+    await _bump("rollup_mood", {"p_day": _day(created_at), "p_mood": mood, "p_delta": 1})
+
+
+async def record_session(started_at: Union[str, datetime], escalated: bool = False) -> None:
+    """Count one new session on the day it started"""
+    await _bump("rollup_sessions", {
+        "p_day": _day(started_at),
+        "p_sessions": 1,
+        "p_escalations": 1 if escalated else 0
+    })
+
+
+async def record_escalation_change(started_at: Union[str, datetime], was_escalated: bool, is_escalated: bool) -> None:
+    """Move a session in or out of the escalation count for its start day"""
+    if bool(was_escalated) == bool(is_escalated):
+        return
+    await _bump("rollup_sessions", {
+        "p_day": _day(started_at),
+        "p_sessions": 0,
+        "p_escalations": 1 if is_escalated else -1
+    })
@@ -0,0 +1,274 @@
+from services.supabase import supabase
+from services.history import compact_history
+from services.llm import LLMService, LLMUnavailableError
+from services import rollups
+from services.cache import invalidate_sessions
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Session summaries are produced by a small in-process job queue: completing a
+# chat enqueues the session, a bounded set of workers runs analyze_chats, and
+# failed attempts are retried with exponential backoff. Progress is mirrored in
+# sessions.summary_status (queued -> running -> done | failed). A worker claims
+# a job in the database before running it (sql/012_summary_claims.sql), so with
+# several processes each session is summarized once, and on start a process
+# takes over jobs that a stopped one left queued or running.
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))
+SUMMARY_MAX_ATTEMPTS = int(os.getenv("SUMMARY_MAX_ATTEMPTS", "3"))
+SUMMARY_RETRY_BACKOFF = float(os.getenv("SUMMARY_RETRY_BACKOFF", "2"))
+# How long a worker's claim on a job holds without being renewed (it is renewed
+# before every attempt), and how many abandoned jobs one start takes over
+SUMMARY_LEASE_SECONDS = int(os.getenv("SUMMARY_LEASE_SECONDS", "600"))
+SUMMARY_RECOVERY_LIMIT = int(os.getenv("SUMMARY_RECOVERY_LIMIT", "20"))
+
+
+async def summarize_session(llm_service: LLMService, emp_id: str, session_id: str) -> Dict[str, Any]:
+    """Analyze a session's transcript and store the result on the session.
+
+    Raises when the analysis fails, so the caller can retry.
+    """
+    conv_history, probable_reason, session = await asyncio.gather(
+        supabase.table("conversations") \
+            .select("conversation, sent_by, created_at") \
+            .eq("emp_id", emp_id) \
+            .eq("session_id", session_id) \
+            .order("created_at") \
+            .execute(),
+        supabase.table("probable_reasons") \
+            .select("interventions") \
+            .eq("emp_id", emp_id) \
+            .eq("session_id", session_id) \
+            .single() \
+            .execute(),
+        supabase.table("sessions") \
+            .select("started_at, is_escalated, history_summary, history_summarized") \
+            .eq("id", session_id) \
+            .eq("emp_id", emp_id) \
+            .execute()
+    )
+    stored = session.data[0] if session.data else {}
+
+    chat_history = compact_history(
+        [f"{msg['sent_by']}: {msg['conversation']}" for msg in conv_history.data or []],
+        stored.get("history_summary"),
+        stored.get("history_summarized") or 0,
+        "analysis"
+    ) or "No conversation history"
+
+    interventions = probable_reason.data.get("interventions", [])
+    intervention_reasons = [intervention["reason"] for intervention in interventions]
+
+    analysis = await llm_service.analyze_chats(
+        intervention_reasons=intervention_reasons,
+        chat_history=chat_history,
+        employee_name=emp_id,
+        strict=True
+    )
+
+    summary_data = {
+        "session_id": session_id,
+        "employee_id": emp_id,
+        "analysis_date": datetime.utcnow().isoformat(),
+        "title": analysis.get("title"),
+        "conversation_summary": analysis["summary"],
+        "identified_reason": analysis["identified_reason"],
+        "vulnerability_score": analysis["vulnerability_score"],
+        "escalation_required": analysis["escalation_required"],
+    }
+
+    update_data = {
+        "title": analysis.get("title"),
+        "summary": analysis["summary"],
+        "vulnerability_score": analysis["vulnerability_score"]["value"],
+        "is_escalated": analysis["escalation_required"],
+        "ended_at": datetime.utcnow().isoformat(),
+        "status": "completed",
+        "identified_reason": analysis["identified_reason"],
+        "summary_status": "done"
+    }
+
+    await supabase.table("sessions") \
+        .update(update_data) \
+        .eq("id", session_id) \
+        .eq("emp_id", emp_id) \
+        .execute()
+
+    if stored:
+        await rollups.record_escalation_change(
+            stored["started_at"],
+            stored["is_escalated"],
+            update_data["is_escalated"]
+        )
+        invalidate_sessions(stored["started_at"])
+
+    return summary_data
+
+
+async def _set_status(session_id: str, summary_status: str) -> None:
+    try:
+        await supabase.table("sessions") \
+            .update({"summary_status": summary_status}) \
+            .eq("id", session_id) \
+            .execute()
+    except Exception as e:
+        logger.error(f"Failed to mark summary of session {session_id} as {summary_status}: {str(e)}")
+
+
+async def _claim(function: str, session_id: str) -> bool:
+    """Run a queue/claim function for the session. When the database can't be
+    reached the job goes ahead unclaimed rather than being dropped."""
+    try:
+        response = await supabase.rpc(function, {
+            "p_session": session_id,
+            "p_lease_seconds": SUMMARY_LEASE_SECONDS
+        }).execute()
+        return bool(response.data)
+    except Exception as e:
+        logger.error(f"{function} failed for session {session_id}: {str(e)}")
+        return True
+
+
+async def _renew_claim(session_id: str) -> None:
+    try:
+        await supabase.table("sessions") \
+            .update({"summary_claimed_at": datetime.now(timezone.utc).isoformat()}) \
+            .eq("id", session_id) \
+            .eq("summary_status", "running") \
+            .execute()
+    except Exception as e:
+        logger.error(f"Failed to renew the summary claim on session {session_id}: {str(e)}")
+
+
+class SummaryQueue:
+    """Bounded worker pool that summarizes sessions in the background"""
+
+    def __init__(self, llm_service: LLMService, workers: int = SUMMARY_WORKERS):
+        self._llm_service = llm_service
+        self._size = workers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Jobs that are queued or running, by session id
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._workers: List[asyncio.Task] = []
+        self._recovery: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._workers = [asyncio.create_task(self._run()) for _ in range(self._size)]
+        self._recovery = asyncio.create_task(self._recover())
+
+    async def _recover(self) -> None:
+        """Take over summaries left queued, or running past their lease, by a stopped process"""
+        try:
+            pending = await supabase.rpc("claim_pending_summaries", {
+                "p_lease_seconds": SUMMARY_LEASE_SECONDS,
+                "p_limit": SUMMARY_RECOVERY_LIMIT
+            }).execute()
+        except Exception as e:
+            logger.error(f"Failed to claim pending session summaries: {str(e)}")
+            return
+
+        for session in pending.data or []:
+            self._add(session["emp_id"], session["id"], claimed=True)
+        if pending.data:
+            logger.info(f"Took over {len(pending.data)} pending session summaries")
+
+    async def enqueue(self, emp_id: str, session_id: str) -> Dict[str, Any]:
+        """Queue a summary for the session, or return the job already in flight for it.
+
+        The session is marked queued first, so the job is picked up again after a
+        restart. If another process is already summarizing it, the returned job is
+        finished with status "claimed".
+        """
+        job = self._jobs.get(session_id)
+        if job is not None:
+            return job
+
+        if not await _claim("queue_session_summary", session_id):
+            job = self._new_job(emp_id, session_id)
+            job["status"] = "claimed"
+            job["done"].set()
+            return job
+        return self._add(emp_id, session_id)
+
+    def _add(self, emp_id: str, session_id: str, claimed: bool = False) -> Dict[str, Any]:
+        job = self._jobs.get(session_id)
+        if job is None:
+            job = self._new_job(emp_id, session_id)
+            job["claimed"] = claimed
+            self._jobs[session_id] = job
+            self._queue.put_nowait(job)
+        return job
+
+    @staticmethod
+    def _new_job(emp_id: str, session_id: str) -> Dict[str, Any]:
+        return {
+            "session_id": session_id,
+            "emp_id": emp_id,
+            "status": "queued",
+            "attempts": 0,
+            "claimed": False,
+            "result": None,
+            "error": None,
+            "done": asyncio.Event(),
+        }
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(session_id)
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            except Exception as e:
+                logger.error(f"Summary job for session {job['session_id']} crashed: {str(e)}", exc_info=True)
+                job["status"] = "failed"
+            finally:
+                self._jobs.pop(job["session_id"], None)
+                job["done"].set()
+                self._queue.task_done()
+
+    async def _process(self, job: Dict[str, Any]) -> None:
+        if not job["claimed"] and not await _claim("claim_session_summary", job["session_id"]):
+            # Another process took it over (e.g. through its start-up recovery)
+            job["status"] = "claimed"
+            return
+        job["status"] = "running"
+
+        while True:
+            await _renew_claim(job["session_id"])
+            job["attempts"] += 1
+            try:
+                job["result"] = await summarize_session(self._llm_service, job["emp_id"], job["session_id"])
+                job["status"] = "done"
+                return
+            except LLMUnavailableError as e:
+                # The circuit breaker is open: not this session's fault, so wait out
+                # the cooldown without using up an attempt
+                job["attempts"] -= 1
+                delay = max(self._llm_service.breaker.retry_in(), SUMMARY_RETRY_BACKOFF)
+                logger.warning(f"Summary of session {job['session_id']} waiting {delay:.0f}s for the LLM ({str(e)})")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                job["error"] = str(e)
+                if job["attempts"] >= SUMMARY_MAX_ATTEMPTS:
+                    logger.error(f"Summary of session {job['session_id']} failed after {job['attempts']} attempts: {str(e)}")
+                    job["status"] = "failed"
+                    await _set_status(job["session_id"], "failed")
+                    return
+                delay = SUMMARY_RETRY_BACKOFF * 2 ** (job["attempts"] - 1)
+                logger.warning(f"Summary of session {job['session_id']} failed ({str(e)}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        tasks = [*self._workers, *([self._recovery] if self._recovery else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
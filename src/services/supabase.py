@@ -1,5 +1,7 @@
-from supabase import create_client, Client
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
 from dotenv import load_dotenv
+import httpx
 import os
 
 load_dotenv()
@@ -10,5 +12,46 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("Supabase URL and Key must be set in environment variables.")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Connection pool settings for the shared PostgREST session
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "50"))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "20"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
 
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client whose requests share one pooled keep-alive HTTP session"""
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            proxy=proxy,
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+
+# Same table/select/eq/order/insert/update builders as the sync client,
+# but every `.execute()` is awaited instead of blocking the event loop.
+supabase = PooledPostgrestClient(
+    f"{SUPABASE_URL.rstrip('/')}/rest/v1",
+    headers={
+        **DEFAULT_POSTGREST_CLIENT_HEADERS,
+        "apiKey": SUPABASE_KEY,
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+    },
+    timeout=SUPABASE_TIMEOUT,
+)
+
+
+async def close_supabase() -> None:
+    """Close the pooled HTTP session on application shutdown"""
+    await supabase.aclose()
@@ -0,0 +1,111 @@
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional
+import os
+
+load_dotenv()
+
+# Rule-based risk score computed before /vibemeter/submit calls the LLM. Only
+# submissions scoring at or above TRIAGE_THRESHOLD go on to the intervention
+# analysis; everything else is answered without a Gemini call.
+TRIAGE_ENABLED = os.getenv("TRIAGE_ENABLED", "true").lower() == "true"
+TRIAGE_THRESHOLD = float(os.getenv("TRIAGE_THRESHOLD", "0.5"))
+TRIAGE_NEGATIVE_MOODS = {
+    mood.strip().lower() for mood in os.getenv("TRIAGE_NEGATIVE_MOODS", "Angry,Sad").split(",") if mood.strip()
+}
+# Number of latest vibes the mood signal looks at, newest weighted highest
+TRIAGE_RECENT_VIBES = int(os.getenv("TRIAGE_RECENT_VIBES", "3"))
+# The vibemeter scale is read as the intensity of the chosen mood
+TRIAGE_SCALE_MAX = int(os.getenv("TRIAGE_SCALE_MAX", "5"))
+# Leave days in the leave window that count as a full leave signal
+TRIAGE_LEAVE_DAYS_HIGH = float(os.getenv("TRIAGE_LEAVE_DAYS_HIGH", "5"))
+# Activity looked at, and the average daily work hours considered normal / a full overwork signal
+TRIAGE_ACTIVITY_DAYS = int(os.getenv("TRIAGE_ACTIVITY_DAYS", "14"))
+TRIAGE_NORMAL_WORK_HOURS = float(os.getenv("TRIAGE_NORMAL_WORK_HOURS", "9"))
+TRIAGE_HIGH_WORK_HOURS = float(os.getenv("TRIAGE_HIGH_WORK_HOURS", "11"))
+
+TRIAGE_WEIGHTS = {
+    "mood": float(os.getenv("TRIAGE_WEIGHT_MOOD", "0.6")),
+    "trend": float(os.getenv("TRIAGE_WEIGHT_TREND", "0.15")),
+    "leave": float(os.getenv("TRIAGE_WEIGHT_LEAVE", "0.15")),
+    "activity": float(os.getenv("TRIAGE_WEIGHT_ACTIVITY", "0.1")),
+    "deviation": float(os.getenv("TRIAGE_WEIGHT_DEVIATION", "0.1")),
+}
+# Distance from the employee's own baseline, in standard deviations, that counts as a full deviation signal
+TRIAGE_DEVIATION_Z_HIGH = float(os.getenv("TRIAGE_DEVIATION_Z_HIGH", "2"))
+
+
+def _negativity(vibe: Dict[str, Any]) -> float:
+    """0 for a non-negative mood, otherwise the mood's intensity in (0, 1]"""
+    if str(vibe.get("mood", "")).lower() not in TRIAGE_NEGATIVE_MOODS:
+        return 0.0
+    scale = vibe.get("scale")
+    if not scale:
+        return 1.0
+    return min(1.0, max(scale, 1) / TRIAGE_SCALE_MAX)
+
+
+def _mood_signal(vibes: List[Dict[str, Any]]) -> float:
+    recent = vibes[:TRIAGE_RECENT_VIBES]
+    if not recent:
+        return 0.0
+    weights = range(len(recent), 0, -1)
+    return sum(w * _negativity(v) for w, v in zip(weights, recent)) / sum(weights)
+
+
+def _trend_signal(vibes: List[Dict[str, Any]]) -> float:
+    """How much more negative the recent vibes are than the older ones"""
+    recent, older = vibes[:TRIAGE_RECENT_VIBES], vibes[TRIAGE_RECENT_VIBES:]
+    if not recent or not older:
+        return 0.0
+    recent_mean = sum(map(_negativity, recent)) / len(recent)
+    older_mean = sum(map(_negativity, older)) / len(older)
+    return max(0.0, recent_mean - older_mean)
+
+
+def _leave_signal(leaves: List[Dict[str, Any]]) -> float:
+    days = sum(leave.get("leave_days") or 0 for leave in leaves)
+    return min(1.0, days / TRIAGE_LEAVE_DAYS_HIGH) if TRIAGE_LEAVE_DAYS_HIGH > 0 else 0.0
+
+
+def _activity_signal(activity: List[Dict[str, Any]]) -> float:
+    hours = [row["work_hours"] for row in activity if row.get("work_hours") is not None]
+    if not hours:
+        return 0.0
+    overtime = sum(hours) / len(hours) - TRIAGE_NORMAL_WORK_HOURS
+    span = TRIAGE_HIGH_WORK_HOURS - TRIAGE_NORMAL_WORK_HOURS
+    return min(1.0, max(0.0, overtime / span)) if span > 0 else 0.0
+
+
+def _deviation_signal(features: Dict[str, Any]) -> float:
+    """How far the latest vibe fell, or recent work hours rose, against the employee's own baseline"""
+    z = max(0.0, -(features.get("vibe_z") or 0.0), features.get("work_hours_z") or 0.0)
+    return min(1.0, z / TRIAGE_DEVIATION_Z_HIGH) if TRIAGE_DEVIATION_Z_HIGH > 0 else 0.0
+
+
+def triage(vibes: List[Dict[str, Any]],
+           leaves: List[Dict[str, Any]],
+           activity: List[Dict[str, Any]],
+           features: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Score a submission's risk in [0, 1] and decide whether it goes to the LLM.
+
+    `vibes` are newest first and include the submission being triaged. `features`
+    (from services.risk_features) adds the deviation signal; without them it is
+    left out of the score. Returns the score, the escalate decision and the
+    per-signal breakdown.
+    """
+    signals = {
+        "mood": _mood_signal(vibes),
+        "trend": _trend_signal(vibes),
+        "leave": _leave_signal(leaves),
+        "activity": _activity_signal(activity),
+    }
+    if features is not None:
+        signals["deviation"] = _deviation_signal(features)
+    total_weight = sum(TRIAGE_WEIGHTS[name] for name in signals) or 1.0
+    score = sum(TRIAGE_WEIGHTS[name] * value for name, value in signals.items()) / total_weight
+
+    return {
+        "score": round(score, 4),
+        "escalate": not TRIAGE_ENABLED or score >= TRIAGE_THRESHOLD,
+        "signals": {name: round(value, 4) for name, value in signals.items()},
+    }
@@ -0,0 +1,125 @@
+from contextlib import aclosing
+from services.llm import CircuitBreaker, LLMService
+import asyncio
+
+
+class _Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class _Chain:
+    """Stands in for `prompt | llm`: yields one chunk, then hangs until cancelled"""
+
+    def __init__(self, started: asyncio.Event):
+        self.started = started
+
+    async def astream(self, inputs):
+        yield _Chunk("{")
+        self.started.set()
+        await asyncio.sleep(3600)
+
+    async def ainvoke(self, inputs):
+        return _Chunk("{}")
+
+
+class _Prompt:
+    def __init__(self, chain):
+        self.chain = chain
+
+    def __or__(self, llm):
+        return self.chain
+
+
+def _half_open_service(cooldown: float) -> LLMService:
+    service = LLMService()
+    service._llm = object()
+    service.breaker = CircuitBreaker(threshold=1, cooldown=cooldown)
+    service.breaker.failure()
+    return service
+
+
+def test_cancelled_half_open_stream_releases_the_trial():
+    async def scenario():
+        service = _half_open_service(cooldown=0.05)
+        await asyncio.sleep(0.06)
+        assert service.breaker.state == "half_open"
+
+        started = asyncio.Event()
+        prompt = _Prompt(_Chain(started))
+
+        async def consume():
+            async with aclosing(service._stream("stream_followup_question", prompt, {}, service.deadline("stream_followup_question"))) as chunks:
+                async for _ in chunks:
+                    pass
+
+        task = asyncio.create_task(consume())
+        await started.wait()
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        # The trial counted as a failure: open again, not stuck half-open
+        assert service.breaker.state == "open"
+        assert not service.breaker.allow()
+
+        await asyncio.sleep(0.06)
+        result = await service._call("analyze_chats", prompt, {}, service.deadline("analyze_chats"))
+        assert result.content == "{}"
+        assert service.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_call_outside_a_trial_does_not_count_as_failure():
+    async def scenario():
+        service = LLMService()
+        service._llm = object()
+        service.breaker = CircuitBreaker(threshold=1, cooldown=60)
+
+        class _Hanging:
+            async def ainvoke(self, inputs):
+                await asyncio.sleep(3600)
+
+        task = asyncio.create_task(service._call("analyze_chats", _Prompt(_Hanging()), {}, service.deadline("analyze_chats")))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert service.breaker.state == "closed"
+        assert service.breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_cancels_the_pending_model_request():
+    async def scenario():
+        service = LLMService()
+        service._llm = object()
+        cancelled = asyncio.Event()
+
+        class _Hanging:
+            async def ainvoke(self, inputs):
+                try:
+                    await asyncio.sleep(3600)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+
+        # Cancelled while waiting to decide on a hedge
+        task = asyncio.create_task(service._hedged("ask_followup_question", _Prompt(_Hanging()), {}))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    asyncio.run(scenario())
+
+
+def test_retry_in_counts_down_the_cooldown():
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    assert breaker.retry_in() == 0
+
+    breaker.failure()
+    assert 29 < breaker.retry_in() <= 30
+    assert not breaker.allow()
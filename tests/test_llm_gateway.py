@@ -0,0 +1,45 @@
+from services.llm import LLMGateway
+import asyncio
+import pytest
+
+
+def test_queue_wait_counts_against_the_deadline():
+    async def scenario():
+        gateway = LLMGateway(max_concurrency=1, rate_per_minute=0, burst=1)
+        loop = asyncio.get_running_loop()
+        release = asyncio.Event()
+
+        async def occupy():
+            async with gateway.slot("analyze_chats"):
+                await release.wait()
+
+        holder = asyncio.create_task(occupy())
+        await asyncio.sleep(0)
+
+        started = loop.time()
+        with pytest.raises(TimeoutError):
+            await gateway.run("analyze_employee_data", None, lambda: asyncio.sleep(0), deadline=started + 0.05)
+        assert loop.time() - started < 0.5
+        # The abandoned call leaves the queue at the same deadline
+        await asyncio.sleep(0.01)
+        assert gateway.stats()["methods"]["analyze_employee_data"]["timed_out"] == 1
+
+        release.set()
+        await holder
+        assert gateway.stats()["running"] == 0
+        assert gateway.stats()["waiting"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_optional_calls_respect_the_concurrency_limit():
+    async def scenario():
+        gateway = LLMGateway(max_concurrency=1, rate_per_minute=0, burst=1)
+        assert gateway.try_acquire()
+        assert not gateway.try_acquire()
+        gateway.release()
+        assert gateway.try_acquire()
+        gateway.release()
+        assert gateway.stats()["running"] == 0
+
+    asyncio.run(scenario())
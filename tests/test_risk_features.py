@@ -0,0 +1,39 @@
+from services.risk_features import employee_features
+from datetime import date
+import os
+import subprocess
+import sys
+
+
+def _vibes(*extra):
+    earlier = [
+        {"created_at": f"2026-10-{day:02d}T09:00:00Z", "mood": "Happy", "scale": scale}
+        for day, scale in [(1, 3), (3, 4), (5, 3), (7, 4)]
+    ]
+    return {"vibemeter": earlier + list(extra)}
+
+
+def test_latest_vibe_is_picked_by_timestamp_within_a_day():
+    morning = {"created_at": "2026-10-10T08:00:00+00:00", "mood": "Happy", "scale": 4}
+    evening = {"created_at": "2026-10-10T17:30:00+00:00", "mood": "Sad", "scale": 5}
+
+    in_order = employee_features("E1", _vibes(morning, evening), date(2026, 10, 12))
+    reversed_order = employee_features("E1", _vibes(evening, morning), date(2026, 10, 12))
+
+    assert in_order["vibe_z"] == reversed_order["vibe_z"]
+    assert in_order["vibe_z"] < 0
+
+
+def test_numpy_is_not_imported_with_the_module():
+    probe = "import sys, services.risk_features; print('numpy' in sys.modules)"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True, env=env)
+    assert result.stdout.strip() == "False"
+
+
+def test_features_do_not_depend_on_the_time_of_day_of_a_submission():
+    morning = {"created_at": "2026-10-10T08:00:00", "mood": "Sad", "scale": 4}
+    evening = {"created_at": "2026-10-10T17:59:10", "mood": "Sad", "scale": 4}
+
+    assert employee_features("E1", _vibes(morning), date(2026, 10, 10)) == \
+        employee_features("E1", _vibes(evening), date(2026, 10, 10))